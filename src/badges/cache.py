@@ -0,0 +1,80 @@
+from django.conf import settings
+
+import hashlib
+import os
+import shutil
+import tempfile
+
+
+def get_page_cache_key(latex, files):
+    """ Returns the key of a compiled page in the page cache.
+
+    `latex` is the complete latex code that is compiled for the page (template and badge data, which contains
+    all texts, colors, the role and permissions), `files` are the paths of the included photos and backgrounds.
+    The size and modification time of the files are part of the key, so changed images are detected.
+    """
+    m = hashlib.sha256(latex.encode())
+    for path in sorted(files):
+        stat = os.stat(path)
+        m.update(repr((path, stat.st_size, stat.st_mtime_ns)).encode())
+    return m.hexdigest()
+
+
+def _get_path(key):
+    return os.path.join(settings.BADGE_PAGE_CACHE_DIR, "%s.pdf" % key)
+
+
+def get_cached_page(key, dest_path):
+    """ Copies the cached page to `dest_path` and returns True, if it is in the cache. """
+    path = _get_path(key)
+
+    try:
+        # mark as recently used
+        os.utime(path)
+
+        try:
+            os.link(path, dest_path)
+        except OSError:
+            shutil.copyfile(path, dest_path)
+    except FileNotFoundError:
+        return False
+
+    return True
+
+
+def store_page(key, src_path):
+    """ Adds a compiled page to the cache. The least recently used pages are deleted, if the cache is full. """
+    os.makedirs(settings.BADGE_PAGE_CACHE_DIR, exist_ok=True)
+
+    # parallel badge creations never see incomplete files
+    fd, tmp_path = tempfile.mkstemp(dir=settings.BADGE_PAGE_CACHE_DIR, prefix=".tmp")
+    try:
+        with os.fdopen(fd, 'wb') as f, open(src_path, 'rb') as src:
+            shutil.copyfileobj(src, f)
+        os.replace(tmp_path, _get_path(key))
+    except Exception:
+        os.remove(tmp_path)
+        raise
+
+
+def cleanup():
+    """ Delete the least recently used pages, so that at most `BADGE_PAGE_CACHE_SIZE` pages are cached. """
+    if not os.path.isdir(settings.BADGE_PAGE_CACHE_DIR):
+        return
+
+    pages = []
+    with os.scandir(settings.BADGE_PAGE_CACHE_DIR) as entries:
+        for entry in entries:
+            try:
+                if entry.is_file() and not entry.name.startswith(".tmp"):
+                    pages.append((entry.stat().st_mtime, entry.path))
+            except FileNotFoundError:
+                # deleted by another process
+                pass
+
+    pages.sort(reverse=True)
+    for mtime, path in pages[settings.BADGE_PAGE_CACHE_SIZE:]:
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
@@ -1,10 +1,12 @@
-def warnings_for_job(job):
-    result = []
+from .planning import BadgePlan
 
-    for helper in job.helpers_and_coordinators():
-        if helper.badge.is_ambiguous() \
-            and (helper.is_coordinator
-                 or not job.event.badge_settings.only_coordinators):
-            result.append(helper)
 
-    return result
+def warnings_for_job(job, plan=None):
+    """ Returns the helpers of the job, whose primary job cannot be determined.
+
+    `plan` is a `BadgePlan` for the event, it is loaded if it is not given.
+    """
+    if plan is None:
+        plan = BadgePlan(job.event, [job, ])
+
+    return plan.warnings_for_job(job)
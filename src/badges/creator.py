@@ -1,11 +1,18 @@
 from django.conf import settings
 
+from concurrent.futures import ThreadPoolExecutor
 from tempfile import mkdtemp, mkstemp
+import io
 import os
 import subprocess
 import shutil
 
+from reportlab.pdfbase.ttfonts import TTFError
+
+import badges.cache
 import badges.models
+import badges.native
+import badges.photos
 
 
 class BadgeCreatorError(Exception):
@@ -26,6 +33,9 @@ class BadgeCreator:
         self.columns = self.settings.columns
         self.rows = self.settings.rows
 
+        # the native renderer draws the badges without LaTeX, so the texts are not escaped
+        self.native = self.settings.renderer == badges.models.BadgeSettings.RENDERER_NATIVE
+
         # list of badges (dict with attributes)
         self.badges = []
 
@@ -33,7 +43,7 @@ class BadgeCreator:
         self.dir = mkdtemp(dir=settings.TMP_ROOT, prefix="badges_")
         self.latex_file, self.latex_file_path = mkstemp(suffix='.tex', dir=self.dir)
 
-        # we copy the photos and background images to the temporary directory
+        # we link (or copy) the photos and background images to the temporary directory
         # pdflatex is only allowed to include files from there
         self.dir_photos = os.path.join(self.dir, 'photos')
         os.mkdir(self.dir_photos, mode=0o700)
@@ -41,20 +51,53 @@ class BadgeCreator:
         self.dir_backgrounds = os.path.join(self.dir, 'backgrounds')
         os.mkdir(self.dir_backgrounds, mode=0o700)
 
-        # prevent that the same file is copied multiple times
-        self._copied_files = []
+        # prevent that the same file is copied multiple times (relative path in temporary directory -> source path)
+        self._copied_files = {}
+
+        # roles, designs, permissions and defaults are loaded only once
+        self._designs = {d.pk: d for d in badges.models.BadgeDesign.objects.filter(badge_settings=self.settings)}
+        self._roles = {r.pk: r for r in badges.models.BadgeRole.objects.filter(badge_settings=self.settings)}
+        self._defaults = self.settings.defaults
+        self._job_defaults = {job.pk: job.badge_defaults for job in
+                              self.settings.event.job_set.select_related('badge_defaults')}
+
+        # values for the permissions per role, e.g. {'perm-food': 'true', 'perm-finance': 'false'}
+        all_permissions = list(badges.models.BadgePermission.objects.filter(badge_settings=self.settings))
+        self._permissions = all_permissions
+        selected_permissions = set(badges.models.BadgeRole.permissions.through.objects
+                                   .filter(badgerole__badge_settings=self.settings)
+                                   .values_list('badgerole_id', 'badgepermission_id'))
+        self._role_permissions = {}
+        for role_pk in self._roles:
+            self._role_permissions[role_pk] = {
+                'perm-%s' % perm.latex_name: 'true' if (role_pk, perm.pk) in selected_permissions else 'false'
+                for perm in all_permissions
+            }
+
+    def _get_defaults(self, job, key):
+        """ Same as `Badge._get_defaults`, but with the preloaded defaults. """
+        job_defaults = self._job_defaults.get(job.pk) if job else None
+
+        # try if 'key' is set for selected job, else use event's default
+        if job_defaults and getattr(job_defaults, key):
+            return getattr(job_defaults, key)
+        return getattr(self._defaults, key)
 
     def add_badge(self, badge):
-        design = badge.get_design()
-        role = badge.get_role()
+        # the primary job is determined only once, it is needed for the texts and defaults
+        job = badge.get_job()
+
+        design = self._designs.get(badge.custom_design_id or self._get_defaults(job, 'design_id'))
+        role = self._roles.get(badge.custom_role_id or self._get_defaults(job, 'role_id'))
+        no_default_role = self._get_defaults(job, 'no_default_role')
 
         tmp = {
             # texts
-            'firstname': self._latex_escape(badge.get_firstname_text()),
-            'surname': self._latex_escape(badge.get_surname_text()),
-            'job': self._latex_escape(badge.get_job_text()),
-            'shift': self._latex_escape(badge.get_shift_text(self.settings)),
-            'role': self._latex_escape(badge.get_role_text(self.settings)),
+            'firstname': self._escape(badge.get_firstname_text()),
+            'surname': self._escape(badge.get_surname_text()),
+            'job': self._escape(badge.get_job_text(job)),
+            'shift': self._escape(badge.get_shift_text(self.settings, job)),
+            'role': self._escape(badge.get_role_text(self.settings, no_default_role)),
 
             'photo': '',  # filled later
 
@@ -83,18 +126,13 @@ class BadgeCreator:
             tmp['id'] = "%010d" % badge.barcode
 
         # permissions
-        all_permissions = badges.models.BadgePermission.objects.filter(badge_settings=self.settings.pk).all()
-        selected_permissions = role.permissions
-        for perm in all_permissions:
-            if selected_permissions.filter(pk=perm.pk).exists():
-                tmp['perm-%s' % perm.latex_name] = 'true'
-            else:
-                tmp['perm-%s' % perm.latex_name] = 'false'
+        tmp.update(self._role_permissions[role.pk])
 
         self.badges.append(tmp)
 
     def generate(self):
-        latex_code = self._get_latex()
+        if self.native:
+            return self._generate_native()
 
         # read template
         try:
@@ -107,26 +145,122 @@ class BadgeCreator:
                                     (self.settings.latex_template.path,
                                      str(e)))
 
-        # replace '%BADGEDATA%'
-        latex = template.replace('%BADGEDATA%', latex_code)
+        # debug
+        if settings.BADGE_TEMPLATE_DEBUG_FILE:
+            self._write_file(settings.BADGE_TEMPLATE_DEBUG_FILE, self._get_latex(template, self.badges))
+
+        if settings.BADGE_PAGE_CACHE_SIZE > 0 and self.badges:
+            # compile every page separately, unchanged pages are taken from the cache. pages that are not cached
+            # need one pdflatex run each, so this is slower than the other cases if the cache is empty.
+            latex = self._generate_parts(template, self.columns * self.rows, use_cache=True)
+        elif settings.BADGE_PDFLATEX_PROCESSES > 1 and \
+                len(self.badges) > settings.BADGE_CHUNK_PAGES * self.columns * self.rows:
+            # split badges into chunks of whole pages, which are compiled in parallel
+            latex = self._generate_parts(template, settings.BADGE_CHUNK_PAGES * self.columns * self.rows)
+        else:
+            # all badges are written to the file directly
+            latex = None
 
         # write code
         try:
             f = os.fdopen(self.latex_file, 'w')
-            f.write(latex)
+            if latex is None:
+                self._write_latex(f, template, self.badges)
+            else:
+                f.write(latex)
             f.close()
         except IOError as e:
             raise BadgeCreatorError("Cannot write to file \"%s\": %s" %
                                     (self.latex_file_path, str(e)))
 
-        # debug
-        if settings.BADGE_TEMPLATE_DEBUG_FILE:
-            shutil.copyfile(self.latex_file_path, settings.BADGE_TEMPLATE_DEBUG_FILE)
+        # return path to pdf
+        pdf_filename = self._pdflatex(self.latex_file_path)
+        return self.dir, pdf_filename
 
-        # call pdflatex
+    def _generate_native(self):
+        """ Draws the badges with reportlab (see `badges.native`), no LaTeX template and pdflatex are used. """
+        os.close(self.latex_file)
+
+        pdf_filename = "%s.pdf" % os.path.splitext(self.latex_file_path)[0]
+        try:
+            badges.native.render(pdf_filename, self.badges, self.settings, self._permissions, self.dir)
+        except (OSError, TTFError) as e:
+            # missing or broken images and fonts, other errors are reported to the admins
+            raise BadgeCreatorError("PDF generation failed", str(e))
+
+        return self.dir, pdf_filename
+
+    def _generate_parts(self, template, part_size, use_cache=False):
+        """ Compiles the badges in parts of `part_size` badges and returns the latex code that merges the PDF
+        files of all parts.
+
+        At most `BADGE_PDFLATEX_PROCESSES` instances of pdflatex run at the same time. If `use_cache` is set,
+        parts that were compiled before with the same data are taken from the page cache (see `badges.cache`).
+        """
+        basename = os.path.splitext(self.latex_file_path)[0]
+
+        part_pdfs = []
+        compile_parts = []  # tuples of path of latex file, index of first badge and cache key
+        for i, first in enumerate(range(0, len(self.badges), part_size)):
+            badges_for_part = self.badges[first:first + part_size]
+            latex = self._get_latex(template, badges_for_part)
+            part_path = "%s_%d" % (basename, i)
+            part_pdfs.append("%s.pdf" % part_path)
+
+            cache_key = None
+            if use_cache:
+                cache_key = badges.cache.get_page_cache_key(latex, self._get_included_files(badges_for_part))
+                if badges.cache.get_cached_page(cache_key, "%s.pdf" % part_path):
+                    continue
+
+            self._write_file("%s.tex" % part_path, latex)
+            compile_parts.append(("%s.tex" % part_path, first, cache_key))
+
+        with ThreadPoolExecutor(max_workers=max(1, settings.BADGE_PDFLATEX_PROCESSES)) as executor:
+            futures = [executor.submit(self._pdflatex, part[0]) for part in compile_parts]
+
+            for (latex_path, first, cache_key), future in zip(compile_parts, futures):
+                try:
+                    pdf_path = future.result()
+                except BadgeCreatorError as e:
+                    # do not start the remaining parts
+                    for f in futures:
+                        f.cancel()
+
+                    last = min(first + part_size, len(self.badges))
+                    raise BadgeCreatorError("PDF generation failed for badges %d to %d" % (first + 1, last),
+                                            e.latex_output)
+
+                if cache_key:
+                    badges.cache.store_page(cache_key, pdf_path)
+
+        if use_cache:
+            badges.cache.cleanup()
+
+        # merge the PDF files in the order of the badges
+        r = r'\documentclass{article}' + "\n"
+        r = r + r'\usepackage{pdfpages}' + "\n"
+        r = r + r'\begin{document}' + "\n"
+        for part_pdf in part_pdfs:
+            r = r + r'\includepdf[pages=-,fitpaper]{%s}' % os.path.basename(part_pdf) + "\n"
+        r = r + r'\end{document}' + "\n"
+
+        return r
+
+    def _get_included_files(self, badges_data):
+        """ Returns the source paths of the photos and backgrounds that are included for the badges. """
+        files = set()
+        for badge in badges_data:
+            for key in ('photo', 'bgfront', 'bgback'):
+                if badge[key]:
+                    files.add(self._copied_files[badge[key]])
+        return files
+
+    def _pdflatex(self, latex_file_path):
+        """ Runs pdflatex in the temporary directory and returns the path of the PDF file. """
         try:
             # only allow read in the directory of the tex file (and write, but this is default)
-            env = os.environ
+            env = os.environ.copy()
             env["openin_any"] = "p"
             env["openout_any"] = "p"
             env["TEXMFOUTPUT"] = self.dir
@@ -135,44 +269,61 @@ class BadgeCreator:
                                      "-halt-on-error",
                                      "-no-shell-escape",
                                      "-output-directory", self.dir,
-                                     os.path.basename(self.latex_file_path)],
-                                    cwd=self.dir)
+                                     os.path.basename(latex_file_path)],
+                                    cwd=self.dir, env=env)
         except subprocess.CalledProcessError as e:
             raise BadgeCreatorError("PDF generation failed", e.output.decode('utf8'))
 
-        # return path to pdf
-        pdf_filename = "%s.pdf" % os.path.splitext(self.latex_file_path)[0]
-        return self.dir, pdf_filename
+        return "%s.pdf" % os.path.splitext(latex_file_path)[0]
+
+    def _write_file(self, path, content):
+        try:
+            with open(path, 'w') as f:
+                f.write(content)
+        except IOError as e:
+            raise BadgeCreatorError("Cannot write to file \"%s\": %s" %
+                                    (path, str(e)))
 
     def finish(self):
         if os.path.isdir(self.dir):
             shutil.rmtree(self.dir)
 
-    def _get_latex(self):
-        # whitespace, if code would be empty
-        if len(self.badges) == 0:
-            return r'\ '
+    def _get_latex(self, template, badges):
+        """ Returns the latex code of the template with the badges. """
+        f = io.StringIO()
+        self._write_latex(f, template, badges)
+        return f.getvalue()
+
+    def _write_latex(self, f, template, badges):
+        """ Writes the template to `f` and replaces '%BADGEDATA%' with the badges.
+
+        The code is written piece by piece, so the time grows only linearly with the number of badges.
+        """
+        template_parts = template.split('%BADGEDATA%')
 
-        r = ''
+        f.write(template_parts[0])
+        for template_part in template_parts[1:]:
+            self._write_badges(f, badges)
+            f.write(template_part)
+
+    def _write_badges(self, f, badges):
+        # whitespace, if code would be empty
+        if len(badges) == 0:
+            f.write(r'\ ')
+            return
 
         # number of badges on one page
         num_page = self.columns*self.rows
 
-        page = 1
-        while (page-1)*num_page < len(self.badges):
+        for first in range(0, len(badges), num_page):
             # helper for this page
-            data_for_page = self.badges[(page-1)*num_page:page*num_page]
+            data_for_page = badges[first:first + num_page]
 
             # front side
-            r = r + self._create_table('badgefront', data_for_page)
+            self._write_table(f, 'badgefront', data_for_page)
 
             # back
-            r = r + self._create_table('badgeback', data_for_page, True)
-
-            # next page
-            page = page + 1
-
-        return r
+            self._write_table(f, 'badgeback', data_for_page, True)
 
     def _create_badge_side(self, latex_command, helper_data):
         data = ",".join(["%s=%s" % (key, helper_data[key]) for key in
@@ -181,18 +332,15 @@ class BadgeCreator:
 
         return template
 
-    def _create_table(self, latex_command, helpers_data, reverse_rows=False):
-        r = ''
-
+    def _write_table(self, f, latex_command, helpers_data, reverse_rows=False):
         # begin of table
-        r = r + r'\begin{tabular}{|l|l|}' + "\n"
-        r = r + r'\hline' + "\n"
+        f.write(r'\begin{tabular}{|l|l|}' + "\n")
+        f.write(r'\hline' + "\n")
 
         # add rows until all helpers were added
-        row = 1
-        while (row-1)*self.columns < len(helpers_data):
+        for first in range(0, len(helpers_data), self.columns):
             # get helpers for this row
-            data_for_row = helpers_data[(row-1)*self.columns:row*self.columns]
+            data_for_row = helpers_data[first:first + self.columns]
 
             latex_for_row = [self._create_badge_side(latex_command, h) for h in
                              data_for_row]
@@ -206,24 +354,16 @@ class BadgeCreator:
                 latex_for_row.reverse()
 
             # insert ' & ' between items, add '\\' and linebreak
-            latex_row = ' & '.join(latex_for_row) + r' \\' + "\n"
-
-            # add to result
-            r = r + latex_row
+            f.write(' & '.join(latex_for_row) + r' \\' + "\n")
 
             # add hline
-            r = r + r'\hline' + "\n"
-
-            # next row
-            row = row + 1
+            f.write(r'\hline' + "\n")
 
         # end of table
-        r = r + r'\end{tabular}' + "\n"
+        f.write(r'\end{tabular}' + "\n")
 
         # page break
-        r = r + "\n" + r'\pagebreak' + "\n\n"
-
-        return r
+        f.write("\n" + r'\pagebreak' + "\n\n")
 
     def _latex_color(self, string):
         # latex expects HTML colors without '#' and uppercase
@@ -232,6 +372,11 @@ class BadgeCreator:
             string = string[1:]
         return string.upper()
 
+    def _escape(self, string):
+        if self.native:
+            return string
+        return self._latex_escape(string)
+
     def _latex_escape(self, string):
         string = string.replace('\\', r'\textbackslash ')
         string = string.replace(r' ', r'\ ')
@@ -248,7 +393,7 @@ class BadgeCreator:
         return '{' + string + '}'
 
     def _copy_photo(self, src_path):
-        return self._copy_file(src_path, self.dir_photos)
+        return self._copy_file(badges.photos.get_processed_photo(src_path), self.dir_photos)
 
     def _copy_background(self, src_path):
         return self._copy_file(src_path, self.dir_backgrounds)
@@ -257,8 +402,16 @@ class BadgeCreator:
         filename = os.path.basename(src_path)
         dest_path = os.path.join(dest_folder, filename)
 
-        if src_path not in self._copied_files:
-            shutil.copyfile(src_path, dest_path)
-            self._copied_files.append(src_path)
+        rel_path = os.path.relpath(dest_path, self.dir)
+        if self._copied_files.get(rel_path) != src_path:
+            # a hard link is enough, pdflatex does not modify the files
+            if os.path.exists(dest_path):
+                os.remove(dest_path)
+
+            try:
+                os.link(src_path, dest_path)
+            except OSError:
+                shutil.copyfile(src_path, dest_path)
+            self._copied_files[rel_path] = src_path
 
-        return os.path.relpath(dest_path, self.dir)
+        return rel_path
@@ -0,0 +1,39 @@
+# Generated by Django 3.1.14 on 2026-10-18 21:17
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+import uuid
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('registration', '0045_shift_occupancy'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('badges', '0020_auto_20210110_2100'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BadgeArtifact',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('name', models.CharField(max_length=250)),
+                ('filename', models.CharField(blank=True, max_length=250)),
+                ('state', models.CharField(choices=[('PENDING', 'Pending'), ('FINISHED', 'Finished'), ('FAILED', 'Failed')], default='PENDING', max_length=20)),
+                ('error', models.TextField(blank=True)),
+                ('latex_output', models.TextField(blank=True)),
+                ('size', models.BigIntegerField(blank=True, null=True)),
+                ('checksum', models.CharField(blank=True, max_length=64)),
+                ('downloaded', models.BooleanField(default=False)),
+                ('created', models.DateTimeField(auto_now_add=True)),
+                ('expires', models.DateTimeField()),
+                ('event', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='registration.event')),
+                ('owner', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['-created'],
+            },
+        ),
+    ]
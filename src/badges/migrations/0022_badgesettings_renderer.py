@@ -0,0 +1,18 @@
+# Generated by Django 3.1.14 on 2026-10-18 21:22
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('badges', '0021_badgeartifact'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='badgesettings',
+            name='renderer',
+            field=models.CharField(choices=[('LATEX', 'LaTeX template'), ('NATIVE', 'Native (fixed layout, faster)')], default='LATEX', help_text='The native renderer creates the PDF file much faster, but it always uses the layout of the\ndefault template. The LaTeX template is only used with the LaTeX renderer.', max_length=20, verbose_name='Renderer for badges'),
+        ),
+    ]
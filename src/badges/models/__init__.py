@@ -1,3 +1,4 @@
+from .artifact import BadgeArtifact
 from .badge import Badge
 from .defaults import BadgeDefaults
 from .design import BadgeDesign
@@ -0,0 +1,26 @@
+from django.conf import settings
+from django.db import models
+from django.db.models.signals import post_delete
+from django.dispatch import receiver
+
+import os
+
+from helfertool.models import Artifact
+
+
+class BadgeArtifact(Artifact):
+    """ A PDF file with badges, which is generated in the background (see `badges.tasks.generate_badges`). """
+
+    latex_output = models.TextField(
+        blank=True,
+    )
+
+    @property
+    def path(self):
+        return os.path.join(settings.BADGE_ARTIFACT_DIR, "%s.pdf" % self.pk)
+
+
+@receiver(post_delete, sender=BadgeArtifact, dispatch_uid='badgeartifact_deleted')
+def badgeartifact_deleted(sender, instance, **kwargs):
+    """ Delete the PDF file, also if the event or user is deleted. """
+    instance.delete_file()
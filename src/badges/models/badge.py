@@ -8,6 +8,10 @@ from .. import tasks
 from .settings import BadgeSettings
 
 
+# marker for the parameter `job` of the text methods: the job was not determined with `get_job` before
+_JOB_UNKNOWN = object()
+
+
 def _badge_upload_path(instance, filename):
     event = str(instance.event.pk)
 
@@ -199,29 +203,45 @@ class Badge(models.Model):
         """ Return text for surname on badge """
         return self.surname or (self.helper.surname if self.helper else "")
 
-    def get_job_text(self):
-        """ Return text for job on badge """
+    def get_job_text(self, job=_JOB_UNKNOWN):
+        """ Return text for job on badge
+
+        `job` is the result of `get_job`, if it is known already.
+        """
         if self.job:
             return self.job
         else:
-            job = self.get_job()  # get the primary job
+            if job is _JOB_UNKNOWN:
+                job = self.get_job()  # get the primary job
             if job:
                 return job.name
         return ""
 
-    def get_shift_text(self, badgesettings):
-        """ Return text for shift on badge """
+    def get_shift_text(self, badgesettings, job=_JOB_UNKNOWN):
+        """ Return text for shift on badge
+
+        `job` is the result of `get_job`, if it is known already.
+        """
         if self.shift:
             return self.shift
         elif self.helper:
-            return self._get_auto_shift_text(self.helper, self.get_job(), badgesettings)
+            if job is _JOB_UNKNOWN:
+                job = self.get_job()
+            return self._get_auto_shift_text(self.helper, job, badgesettings)
         return ""
 
-    def get_role_text(self, badgesettings):
-        """ Return text for role on badge """
+    def get_role_text(self, badgesettings, no_default_role=None):
+        """ Return text for role on badge
+
+        `no_default_role` is the result of `no_default_role()`, if it is known already.
+        """
         if self.role:
             return self.role
-        elif self.helper and not self.no_default_role():
+
+        if self.helper and no_default_role is None:
+            no_default_role = self.no_default_role()
+
+        if self.helper and not no_default_role:
             # no_default_role means that we do not want to have a role like "coordinator" on the badge
             if self.helper.is_coordinator:
                 return badgesettings.coordinator_title
@@ -238,7 +258,8 @@ class Badge(models.Model):
         Returns the text (not LaTeX escaped!)
         """
         shift_texts = []
-        for shift in helper.shifts.all().order_by('begin'):
+        # sorted in python, so that prefetched shifts can be used
+        for shift in sorted(helper.shifts.all(), key=lambda s: s.begin):
             # get shift date / name
             cur_text = ""
             if not badgesettings.shift_no_names and shift.name:
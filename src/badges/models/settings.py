@@ -35,6 +35,14 @@ class BadgeSettings(models.Model):
         (SHIFT_FORMAT_DATE, _("Include date")),
     )
 
+    RENDERER_LATEX = 'LATEX'
+    RENDERER_NATIVE = 'NATIVE'
+
+    RENDERER_CHOICES = (
+        (RENDERER_LATEX, _("LaTeX template")),
+        (RENDERER_NATIVE, _("Native (fixed layout, faster)")),
+    )
+
     event = models.OneToOneField(
         'registration.Event',
         on_delete=models.CASCADE,
@@ -51,6 +59,15 @@ class BadgeSettings(models.Model):
         null=True,
     )
 
+    renderer = models.CharField(
+        choices=RENDERER_CHOICES,
+        default=RENDERER_LATEX,
+        max_length=20,
+        verbose_name=_("Renderer for badges"),
+        help_text=_("""The native renderer creates the PDF file much faster, but it always uses the layout of the
+default template. The LaTeX template is only used with the LaTeX renderer."""),
+    )
+
     rows = models.IntegerField(
         default=5,
         verbose_name=_("Number of rows on one page"),
@@ -116,7 +133,7 @@ Nevertheless, the weekday or date may be required for events with several days."
         super(BadgeSettings, self).save(*args, **kwargs)
 
     def creation_possible(self):
-        if not self.latex_template:
+        if self.renderer == BadgeSettings.RENDERER_LATEX and not self.latex_template:
             return False
 
         if not self.defaults.role:
@@ -0,0 +1,185 @@
+from django.conf import settings
+
+from reportlab.graphics.barcode.code39 import Standard39
+from reportlab.lib.colors import HexColor, white, black
+from reportlab.lib.pagesizes import A4
+from reportlab.lib.units import cm, mm
+from reportlab.lib.utils import ImageReader, simpleSplit
+from reportlab.pdfbase import pdfmetrics
+from reportlab.pdfbase.ttfonts import TTFont
+from reportlab.pdfgen import canvas
+
+import os
+
+# layout of the default LaTeX template (badges/latextemplate/badge.tex)
+badge_width = 8*cm
+badge_height = 5*cm
+margin = 10*mm
+
+# the built-in font only contains the characters of Windows-1252, so a TrueType font is used if available
+fallback_font = "Helvetica"
+badge_font = "BadgeFont"
+
+
+def _get_font():
+    """ Returns the name of the font for the texts, the TrueType font `BADGE_NATIVE_FONT` is registered once. """
+    if not settings.BADGE_NATIVE_FONT or not os.path.isfile(settings.BADGE_NATIVE_FONT):
+        return fallback_font
+
+    if badge_font not in pdfmetrics.getRegisteredFontNames():
+        pdfmetrics.registerFont(TTFont(badge_font, settings.BADGE_NATIVE_FONT))
+    return badge_font
+
+
+def render(pdf_path, badges, badgesettings, permissions, base_dir):
+    """ Draws the badges with reportlab, without LaTeX.
+
+    The layout is the same as in the default LaTeX template: the front sides of one page of badges are followed
+    by the back sides (in reversed order per row, for printing on both sides).
+
+    Parameter:
+        pdf_path:      the PDF file that is written
+        badges:        list of badge data from `BadgeCreator` (texts are not escaped)
+        badgesettings: the `BadgeSettings` of the event (for the number of columns and rows)
+        permissions:   list of all `BadgePermission`s of the event
+        base_dir:      the paths of photos and backgrounds are relative to this directory
+    """
+    columns = badgesettings.columns
+    rows = badgesettings.rows
+
+    # scale badges if the page is too small for the configured number of columns and rows
+    page_width, page_height = A4
+    scale = min(1, (page_width - 2*margin) / (columns*badge_width), (page_height - 2*margin) / (rows*badge_height))
+    width = badge_width*scale
+    height = badge_height*scale
+
+    left = (page_width - columns*width) / 2
+    top = page_height - margin
+
+    font = _get_font()
+    c = canvas.Canvas(pdf_path, pagesize=A4)
+
+    num_page = columns*rows
+    for first in range(0, len(badges), num_page):
+        data_for_page = badges[first:first + num_page]
+
+        for side in ('front', 'back'):
+            for i, data in enumerate(data_for_page):
+                row, column = divmod(i, columns)
+
+                # back sides are mirrored
+                if side == 'back':
+                    column = columns - 1 - column
+
+                x = left + column*width
+                y = top - row*height
+
+                if side == 'front':
+                    _draw_front(c, x, y, width, height, data, font, base_dir)
+                else:
+                    _draw_back(c, x, y, width, height, data, permissions, font, base_dir)
+
+                # cutting lines
+                c.setStrokeColor(black)
+                c.setLineWidth(0.4)
+                c.rect(x, y - height, width, height, stroke=1, fill=0)
+
+            c.showPage()
+
+    c.save()
+
+
+def _draw_background(c, x, y, width, height, data, image, base_dir):
+    c.setFillColor(HexColor("#%s" % data['bgcolor']))
+    c.rect(x, y - height, width, height, stroke=0, fill=1)
+
+    if image:
+        c.drawImage(os.path.join(base_dir, image), x, y - height, width, height)
+
+
+def _draw_text(c, x, y, text, font, size, max_width):
+    """ Draws the text with the upper left corner at (x, y), lines are wrapped at `max_width`. """
+    c.setFont(font, size)
+    for line in simpleSplit(text, font, size, max_width):
+        y -= size
+        c.drawString(x, y, line)
+        y -= size*0.2
+
+
+def _draw_front(c, x, y, width, height, data, font, base_dir):
+    _draw_background(c, x, y, width, height, data, data['bgfront'], base_dir)
+
+    # coordinates relative to badge, (0, 0) is the top left corner, (1, 1) the bottom right corner
+    def pos(rel_x, rel_y):
+        return x + rel_x*width, y - rel_y*height
+
+    c.setFillColor(HexColor("#%s" % data['fontcolor']))
+
+    # name
+    name = "{} {}".format(data['firstname'], data['surname'])
+    _draw_text(c, *pos(0.05, 0.1), name, font, 14.4, 0.5*width)
+
+    # job, role and shift
+    _draw_text(c, *pos(0.05, 0.5), data['job'], font, 12, 0.5*width)
+    _draw_text(c, *pos(0.05, 0.6), data['role'], font, 12, 0.5*width)
+    _draw_text(c, *pos(0.05, 0.75), data['shift'], font, 10.95, 0.9*width)
+
+    # photo
+    if data['photo']:
+        photo = ImageReader(os.path.join(base_dir, data['photo']))
+        photo_width, photo_height = photo.getSize()
+
+        draw_width = 0.3*width
+        draw_height = draw_width * photo_height / photo_width
+
+        photo_x, photo_y = pos(0.65, 0.05)
+        c.drawImage(photo, photo_x, photo_y - draw_height, draw_width, draw_height)
+
+
+def _draw_back(c, x, y, width, height, data, permissions, font, base_dir):
+    _draw_background(c, x, y, width, height, data, data['bgback'], base_dir)
+
+    def pos(rel_x, rel_y):
+        return x + rel_x*width, y - rel_y*height
+
+    c.setFillColor(HexColor("#%s" % data['fontcolor']))
+
+    # rotated name
+    size = 10.95
+    name = "{} {}".format(data['firstname'], data['surname'])
+    c.saveState()
+    c.translate(x + 0.02*width + size, y - height)
+    c.rotate(90)
+    c.setFont(font, size)
+    c.drawCentredString(height / 2, 0, name)
+    c.restoreState()
+
+    # permissions, not granted permissions are crossed out
+    size = 12
+    c.setFont(font, size)
+    c.setStrokeColor(HexColor("#%s" % data['fontcolor']))
+    c.setLineWidth(2.25)
+
+    step = min(0.25, 0.55 / max(len(permissions) - 1, 1))
+    for i, permission in enumerate(permissions):
+        perm_x, perm_y = pos(0.15, 0.35 + i*step)
+        perm_y -= size
+
+        c.drawString(perm_x, perm_y, permission.name)
+        if data['perm-%s' % permission.latex_name] != 'true':
+            text_width = c.stringWidth(permission.name, font, size)
+            c.line(perm_x, perm_y + 0.3*size, perm_x + text_width, perm_y + 0.3*size)
+
+    # barcode
+    if data['id']:
+        barcode = Standard39(data['id'], barWidth=0.23*mm, barHeight=1*cm, checksum=0, quiet=0)
+
+        c.setFillColor(white)
+        c.rect(x + 0.78*width, y - height, 0.22*width, height, stroke=0, fill=1)
+
+        c.saveState()
+        c.translate(x + 0.82*width + barcode.barHeight, y - height + (height - barcode.width) / 2)
+        c.rotate(90)
+        c.setFillColor(black)
+        barcode.drawOn(c, 0, 0)
+        c.restoreState()
@@ -0,0 +1,73 @@
+from django.conf import settings
+
+from PIL import Image, ImageOps
+
+import hashlib
+import os
+import tempfile
+import time
+
+
+def _get_cache_key(src_path):
+    """ Returns the key of a photo in the photo cache.
+
+    The key contains the path, size and modification time of the file (so the file does not need to be read)
+    and the parameters of the processing.
+    """
+    stat = os.stat(src_path)
+    key = (src_path, stat.st_size, stat.st_mtime_ns, settings.BADGE_PHOTO_MAX_SIZE, settings.BADGE_PHOTO_JPEG_QUALITY)
+    return hashlib.sha256(repr(key).encode()).hexdigest()
+
+
+def get_processed_photo(src_path):
+    """ Returns the path of the processed photo for the badges.
+
+    Photos are rotated according to their EXIF data, scaled to `BADGE_PHOTO_MAX_SIZE` and stored as JPEG once.
+    The processed files are stored in `BADGE_PHOTO_CACHE_DIR`, so every photo is processed only once, even if it
+    is used for multiple badges. Changed files are processed again. Photos that were not used for
+    `BADGE_PHOTO_CACHE_TIMEOUT` seconds are deleted by `cleanup`.
+    """
+    path = os.path.join(settings.BADGE_PHOTO_CACHE_DIR, "%s.jpg" % _get_cache_key(src_path))
+    try:
+        # mark as recently used
+        os.utime(path)
+        return path
+    except FileNotFoundError:
+        pass
+
+    os.makedirs(settings.BADGE_PHOTO_CACHE_DIR, exist_ok=True)
+
+    with Image.open(src_path) as src:
+        img = ImageOps.exif_transpose(src)
+        img = img.convert('RGB')
+    img.thumbnail((settings.BADGE_PHOTO_MAX_SIZE,
+                   settings.BADGE_PHOTO_MAX_SIZE))
+
+    # the photo is written to a temporary file first, so parallel badge creations never see incomplete files
+    fd, tmp_path = tempfile.mkstemp(dir=settings.BADGE_PHOTO_CACHE_DIR, prefix=".tmp", suffix=".jpg")
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            img.save(f, 'JPEG', quality=settings.BADGE_PHOTO_JPEG_QUALITY, optimize=True)
+        os.replace(tmp_path, path)
+    except Exception:
+        os.remove(tmp_path)
+        raise
+
+    return path
+
+
+def cleanup():
+    """ Delete the photos that were not used for `BADGE_PHOTO_CACHE_TIMEOUT` seconds (and left temporary files). """
+    if not os.path.isdir(settings.BADGE_PHOTO_CACHE_DIR):
+        return
+
+    min_mtime = time.time() - settings.BADGE_PHOTO_CACHE_TIMEOUT
+
+    with os.scandir(settings.BADGE_PHOTO_CACHE_DIR) as entries:
+        for entry in entries:
+            try:
+                if entry.is_file() and entry.stat().st_mtime < min_mtime:
+                    os.remove(entry.path)
+            except FileNotFoundError:
+                # deleted by another process
+                pass
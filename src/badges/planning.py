@@ -0,0 +1,58 @@
+from django.db.models import Prefetch, Q
+
+from collections import defaultdict
+
+import registration
+
+
+class BadgePlan:
+    """ Helpers of an event with their badges, shifts and coordinated jobs, loaded with a constant number of queries.
+
+    The primary job of each badge (`Badge.get_job`), the ambiguity and the texts of the badges are determined
+    from the loaded data, so no further queries are necessary for them.
+
+    Parameter:
+        event: the event
+        jobs:  only load helpers and coordinators of these jobs (optional, default: all helpers of the event)
+    """
+    def __init__(self, event, jobs=None):
+        self.event = event
+
+        shifts = registration.models.Shift.objects.select_related('job')
+        helpers = event.helper_set.select_related('badge', 'badge__primary_job') \
+            .prefetch_related(Prefetch('shifts', queryset=shifts), 'job_set') \
+            .order_by('surname', 'firstname', 'pk')
+        if jobs is not None:
+            helpers = helpers.filter(Q(shifts__job__in=jobs) | Q(job__in=jobs)).distinct()
+
+        self.helpers = list(helpers)
+
+        # helpers and coordinators per job and primary job per helper
+        self._helpers_by_job = defaultdict(list)
+        self._primary_jobs = {}
+        for helper in self.helpers:
+            helper_jobs = {shift.job_id for shift in helper.shifts.all()}
+            helper_jobs.update(job.pk for job in helper.job_set.all())
+
+            for job_pk in helper_jobs:
+                self._helpers_by_job[job_pk].append(helper)
+
+            self._primary_jobs[helper.pk] = helper.badge.get_job()
+
+    def helpers_and_coordinators(self, job):
+        """ Same as `Job.helpers_and_coordinators`, but from the loaded data. """
+        return self._helpers_by_job[job.pk]
+
+    def get_job(self, helper):
+        """ Returns the primary job of the badge of the helper (see `Badge.get_job`). """
+        return self._primary_jobs[helper.pk]
+
+    def is_ambiguous(self, helper):
+        return self.get_job(helper) is None
+
+    def warnings_for_job(self, job):
+        """ Returns the helpers of the job, whose primary job cannot be determined. """
+        only_coordinators = self.event.badge_settings.only_coordinators
+
+        return [helper for helper in self.helpers_and_coordinators(job)
+                if self.is_ambiguous(helper) and (helper.is_coordinator or not only_coordinators)]
@@ -1,7 +1,6 @@
 from __future__ import absolute_import
 
 from celery import shared_task
-from celery.exceptions import Ignore
 
 from django.conf import settings
 from django.utils import translation
@@ -9,11 +8,16 @@ from django.utils.translation import ugettext as _
 
 from PIL import Image
 
+import logging
+logger = logging.getLogger("helfertool.badges")
+
 import os
 import shutil
 
 import badges
 import badges.creator
+import badges.photos
+import badges.planning
 import registration
 
 
@@ -24,10 +28,35 @@ def scale_badge_photo(filepath):
                    settings.BADGE_PHOTO_MAX_SIZE))
     img.save(filepath)
 
+    # prepare the photo for the badges, so that this is not necessary during the generation
+    badges.photos.get_processed_photo(filepath)
+
+
+@shared_task
+def cleanup_photo_cache():
+    """ Deletes the prepared photos that were not used for a long time (periodic task). """
+    badges.photos.cleanup()
+
+
+@shared_task
+def generate_badges(artifact_pk, job_pk, generate, skip_printed):
+    """ Generates the PDF file with the badges for the `BadgeArtifact` and stores it in `BADGE_ARTIFACT_DIR`. """
+    # tasks that were queued by older versions get the pk of the event. the user who started it is unknown, so
+    # the result could not be downloaded, the generation must be started again.
+    if isinstance(artifact_pk, int):
+        logger.warning("badges dropped", extra={
+            'event': registration.models.Event.objects.filter(pk=artifact_pk).first(),
+            'reason': "started before the update, must be started again",
+        })
+        return
+
+    try:
+        artifact = badges.models.BadgeArtifact.objects.select_related('event').get(pk=artifact_pk)
+    except badges.models.BadgeArtifact.DoesNotExist:
+        # artifact was deleted in the meantime
+        return
+    event = artifact.event
 
-@shared_task(bind=True, throws=(badges.creator.BadgeCreatorError, ))
-def generate_badges(self, event_pk, job_pk, generate, skip_printed):
-    event = registration.models.Event.objects.get(pk=event_pk)
     try:
         job = registration.models.Job.objects.get(pk=job_pk)
     except registration.models.Job.DoesNotExist:
@@ -40,64 +69,64 @@ def generate_badges(self, event_pk, job_pk, generate, skip_printed):
     # badge creation
     creator = badges.creator.BadgeCreator(event.badge_settings)
 
-    # determine the jobs, that will be included, and the filename
-    if generate == "job" and job:
-        jobs = [job, ]
-        filename = job.name
-    elif generate == "special":
-        jobs = []
-        filename = _("Special badges")
-    elif generate == "all":
-        jobs = event.job_set.all()
-        filename = event.name
-    else:
-        raise ValueError("Invalid parameters")
-
-    # add helpers and coordinators from selected jobs
-    for j in jobs:
-        for h in j.helpers_and_coordinators():
-            # skip if badge was printed already
-            # (and this behaviour is requested)
-            if skip_printed and h.badge.printed:
-                continue
-
-            helpers_job = h.badge.get_job()
-            # print badge only if this is the primary job or the job is
-            # unambiguous
-            if (not helpers_job or helpers_job == j):
-                # skip helpers if this is requested
-                if event.badge_settings.only_coordinators and \
-                        not h.is_coordinator:
+    try:
+        # determine the jobs, that will be included, and the filename
+        if generate == "job" and job:
+            jobs = [job, ]
+            filename = job.name
+        elif generate == "special":
+            jobs = []
+            filename = _("Special badges")
+        elif generate == "all":
+            jobs = event.job_set.all()
+            filename = event.name
+        else:
+            raise ValueError("Invalid parameters")
+
+        # load helpers, badges, shifts and coordinated jobs at once
+        plan = badges.planning.BadgePlan(event, jobs)
+
+        # add helpers and coordinators from selected jobs
+        for j in jobs:
+            for h in plan.helpers_and_coordinators(j):
+                # skip if badge was printed already
+                # (and this behaviour is requested)
+                if skip_printed and h.badge.printed:
                     continue
 
-                creator.add_badge(h.badge)
-
-    # add special badges
-    if generate == "special" or generate == "all":
-        for b in badges.models.Badge.objects.filter(event=event, helper=None):
-            if not (skip_printed and b.printed):
-                creator.add_badge(b)
-
-    # try to generate the pdf file
-    try:
-        tmp_dir, pdf_filename = creator.generate()
-    except badges.creator.BadgeCreatorError as e:
-        creator.finish()
-        self.update_state(state='CREATOR_ERROR',
-                          meta={'error': e.value,
-                                'latex_output': e.latex_output})
-        raise Ignore()
+                helpers_job = plan.get_job(h)
+                # print badge only if this is the primary job or the job is
+                # unambiguous
+                if (not helpers_job or helpers_job == j):
+                    # skip helpers if this is requested
+                    if event.badge_settings.only_coordinators and \
+                            not h.is_coordinator:
+                        continue
+
+                    creator.add_badge(h.badge)
+
+        # add special badges
+        if generate == "special" or generate == "all":
+            for b in badges.models.Badge.objects.filter(event=event, helper=None).select_related('primary_job'):
+                if not (skip_printed and b.printed):
+                    creator.add_badge(b)
+
+        # try to generate the pdf file
+        try:
+            pdf_filename = creator.generate()[1]
+        except badges.creator.BadgeCreatorError as e:
+            artifact.fail(error=e.value, latex_output=e.latex_output or "")
+            return
+
+        # move the pdf file to the artifacts, the temporary files are not needed anymore
+        os.makedirs(settings.BADGE_ARTIFACT_DIR, exist_ok=True)
+        shutil.move(pdf_filename, artifact.path)
+    except Exception:
+        # the admins get a mail with the exception (see helfertool.celery)
+        artifact.fail()
+        raise
     finally:
+        creator.finish()
         translation.activate(prev_language)
 
-    # schedule cleanup task
-    clean = cleanup.subtask((tmp_dir, ), countdown=settings.BADGE_PDF_TIMEOUT + settings.BADGE_RM_DELAY)
-    cleanup_task = clean.delay()
-
-    return pdf_filename, filename, cleanup_task.task_id
-
-
-@shared_task
-def cleanup(tmp_dir):
-    if os.path.isdir(tmp_dir):
-        shutil.rmtree(tmp_dir)
+    artifact.finish(filename, settings.BADGE_PDF_TIMEOUT)
@@ -125,13 +125,13 @@ urlpatterns = [
 
     # failed page
     url(r'^(?P<event_url_name>[a-zA-Z0-9]+)/badges/failed/'
-        r'(?P<task_id>[a-z0-9\-]+)/$',
+        r'(?P<artifact_pk>[0-9a-f\-]+)/$',
         views.failed,
         name='failed'),
 
     # download badges
     url(r'^(?P<event_url_name>[a-zA-Z0-9]+)/badges/download/'
-        r'(?P<task_id>[a-z0-9\-]+)/$',
+        r'(?P<artifact_pk>[0-9a-f\-]+)/$',
         views.download,
         name='download'),
 
@@ -1,13 +1,16 @@
 from django.contrib.auth.decorators import login_required
-from django.core.mail import mail_admins
+from django.db import transaction
 from django.urls import reverse
-from django.http import HttpResponse, HttpResponseRedirect
+from django.http import FileResponse, HttpResponseRedirect
 from django.shortcuts import render, get_object_or_404
+from django.utils import timezone
 from django.utils.translation import ugettext as _
 
-from celery.result import AsyncResult
+import os
 
 from ..checks import warnings_for_job
+from ..models import BadgeArtifact
+from ..planning import BadgePlan
 from .. import tasks
 
 from registration.decorators import archived_not_available
@@ -19,39 +22,6 @@ from registration.permissions import has_access, ACCESS_BADGES_GENERATE
 from .utils import notactive
 
 
-def create_task_dict(task_id, name, event):
-    tmp = {}
-    tmp['id'] = task_id
-    tmp['name'] = name
-    tmp['event'] = event.pk
-
-    return tmp
-
-
-class BadgeTaskResult:
-    def __init__(self, task_id, name=None):
-        result = AsyncResult(task_id)
-
-        self.id = task_id
-        self.name = name
-
-        self.finished = result.successful()
-        self.error = result.failed() or result.state == "CREATOR_ERROR"
-        self.expired = False
-        self.pdf = None
-        self.dl_filename = None
-
-        if result.successful():
-            pdf, dl_filename, clean_task_id = result.result
-
-            clean_result = AsyncResult(clean_task_id)
-            if clean_result.state == 'SUCCESS':
-                self.expired = True
-
-            self.pdf = pdf
-            self.dl_filename = dl_filename
-
-
 @login_required
 @archived_not_available
 def index(request, event_url_name):
@@ -69,9 +39,10 @@ def index(request, event_url_name):
     possible = event.badge_settings.creation_possible()
 
     # number for warnings for each job
+    plan = BadgePlan(event)
     jobs = event.job_set.all()
     for job in jobs:
-        job.num_warnings = len(warnings_for_job(job))
+        job.num_warnings = len(warnings_for_job(job, plan))
 
     context = {'event': event,
                'jobs': jobs,
@@ -97,28 +68,16 @@ def tasklist(request, event_url_name):
     if not event.badges:
         return notactive(request)
 
-    # recently started tasks
-    if 'badge_tasks' not in request.session:
-        request.session['badge_tasks'] = []
-
-    task_results = []
-    task_list_del = []
-    for task in request.session['badge_tasks']:
-        tmp = BadgeTaskResult(task['id'], task['name'])
+    # older versions stored the generations in the session, they cannot be shown anymore
+    if 'badge_tasks' in request.session:
+        del request.session['badge_tasks']
 
-        # filter expired tasks
-        if tmp.expired:
-            task_list_del.append(task)
-        elif task['event'] == event.pk:
-            task_results.append(tmp)
-
-    # remove expired filtered tasks
-    for task in task_list_del:
-        request.session['badge_tasks'].remove(task)
-    request.session.modified = True
+    # recently started generations of this user (downloaded or expired files are not shown)
+    artifacts = BadgeArtifact.objects.filter(event=event, owner=request.user, downloaded=False,
+                                             expires__gt=timezone.now())
 
     context = {'event': event,
-               'tasks': task_results,
+               'tasks': artifacts,
                'no_login': False}
     return render(request, 'badges/tasklist.html', context)
 
@@ -179,9 +138,6 @@ def generate(request, event_url_name, job_pk=None, generate=None, skip_printed=T
     if not event.badge_settings.barcodes:
         skip_printed = False
 
-    # start generation
-    result = tasks.generate_badges.delay(event.pk, job_pk, generate, skip_printed)
-
     # name to be displayed in web interface
     name = None
     if job:
@@ -200,21 +156,17 @@ def generate(request, event_url_name, job_pk=None, generate=None, skip_printed=T
         else:
             name = _("Really all badges")
 
-    # add to session
-    if 'badge_tasks' not in request.session:
-        request.session['badge_tasks'] = []
-
-    task = create_task_dict(result.task_id, name, event)
-
-    request.session['badge_tasks'].insert(0, task)
-    request.session.modified = True
+    # start generation, the file is stored as artifact
+    artifact = BadgeArtifact.objects.create(event=event, owner=request.user, name=name,
+                                            expires=timezone.now() + BadgeArtifact.PENDING_TIMEOUT)
+    transaction.on_commit(lambda: tasks.generate_badges.delay(str(artifact.pk), job_pk, generate, skip_printed))
 
     return HttpResponseRedirect(reverse('badges:index', args=[event.url_name]))
 
 
 @login_required
 @archived_not_available
-def failed(request, event_url_name, task_id):
+def failed(request, event_url_name, artifact_pk):
     event = get_object_or_404(Event, url_name=event_url_name)
 
     # check permission
@@ -225,19 +177,17 @@ def failed(request, event_url_name, task_id):
     if not event.badges:
         return notactive(request)
 
-    # get result
-    result = AsyncResult(task_id)
+    artifact = get_object_or_404(BadgeArtifact, pk=artifact_pk, event=event, owner=request.user)
 
     error = None
     latex_output = None
 
-    if result.failed():
-        error = _("Internal Server Error. The admins were notified.")
-        mail_admins("Badge generation error", str(result.result),
-                    fail_silently=True)
-    elif result.state == "CREATOR_ERROR":
-        error = result.info['error']
-        latex_output = result.info['latex_output']
+    if artifact.failed:
+        if artifact.latex_output:
+            error = artifact.error
+            latex_output = artifact.latex_output
+        else:
+            error = artifact.error or _("Internal Server Error. The admins were notified.")
 
     # return error message
     context = {'event': event,
@@ -249,7 +199,7 @@ def failed(request, event_url_name, task_id):
 
 @login_required
 @archived_not_available
-def download(request, event_url_name, task_id):
+def download(request, event_url_name, artifact_pk):
     event = get_object_or_404(Event, url_name=event_url_name)
 
     # check permission
@@ -260,37 +210,18 @@ def download(request, event_url_name, task_id):
     if not event.badges:
         return notactive(request)
 
-    # remove from list
-    if 'badge_tasks' not in request.session:
-        request.session['badge_tasks'] = []
+    artifact = get_object_or_404(BadgeArtifact, pk=artifact_pk, event=event, owner=request.user)
 
-    del_task = None
-    for task in request.session['badge_tasks']:
-        if task['id'] == task_id:
-            del_task = task
-            break
-
-    if del_task:
-        request.session['badge_tasks'].remove(del_task)
-        request.session.modified = True
-    # TODO: files can be deleted also, happens through celery at the moment
-
-    # get result
-    badge_task = BadgeTaskResult(task_id)
-
-    if badge_task.finished and not badge_task.expired:
-        # output
-        filename = escape_filename("%s.pdf" % badge_task.dl_filename)
-
-        response = HttpResponse(content_type='application/pdf')
-        response['Content-Disposition'] = 'attachment; filename="%s"' % \
-            filename
+    if artifact.finished and not artifact.expired and os.path.isfile(artifact.path):
+        # remove from list
+        if not artifact.downloaded:
+            artifact.downloaded = True
+            artifact.save(update_fields=['downloaded'])
 
         # send file
-        with open(badge_task.pdf, 'rb') as f:
-            response.write(f.read())
-
-        return response
+        filename = escape_filename("%s.pdf" % artifact.filename)
+        return FileResponse(open(artifact.path, 'rb'), as_attachment=True, filename=filename,
+                            content_type='application/pdf')
     else:
         # return error message
         context = {'event': event}
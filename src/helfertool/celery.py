@@ -25,6 +25,14 @@ def setup_periodic_tasks(sender, **kwargs):
     from mail.tasks import receive_mails
     sender.add_periodic_task(settings.RECEIVE_INTERVAL, receive_mails.s(), name='receive mails')
 
+    # referenced by name, shared tasks cannot be used before the app is finalized
+    sender.add_periodic_task(settings.ARTIFACT_SWEEP_INTERVAL, sender.signature('helfertool.tasks.sweep_artifacts'),
+                             name='delete expired artifacts')
+    sender.add_periodic_task(60 * 60, sender.signature('registration.tasks.cleanup_export_cache'),
+                             name='delete old cached exports')
+    sender.add_periodic_task(24 * 60 * 60, sender.signature('badges.tasks.cleanup_photo_cache'),
+                             name='delete unused badge photos')
+
 
 @task_failure.connect
 def celery_error_handler(task_id, exception, traceback, einfo, *args, **kwargs):
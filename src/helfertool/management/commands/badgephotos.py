@@ -0,0 +1,43 @@
+from concurrent.futures import ProcessPoolExecutor
+
+from django.core.management.base import BaseCommand, CommandError
+
+from badges.models import Badge
+from badges.photos import get_processed_photo
+from registration.models import Event
+
+
+class Command(BaseCommand):
+    help = 'Prepares the badge photos of events for the badge generation (rotated, scaled and converted to JPEG)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('event_url_name', nargs='*', type=str,
+                            help="URL names of the events (default: all events)")
+        parser.add_argument('--processes', type=int, default=None,
+                            help="Number of parallel processes (default: number of CPUs)")
+
+    def handle(self, *args, **options):
+        badges = Badge.objects.exclude(photo='').exclude(photo=None)
+
+        if options['event_url_name']:
+            for event_url_name in options['event_url_name']:
+                if not Event.objects.filter(url_name=event_url_name).exists():
+                    raise CommandError('Event "%s" does not exist' % event_url_name)
+            badges = badges.filter(event__url_name__in=options['event_url_name'])
+
+        paths = set(badge.photo.path for badge in badges.only('photo'))
+
+        num_failed = 0
+        with ProcessPoolExecutor(max_workers=options['processes']) as executor:
+            futures = {executor.submit(get_processed_photo, path): path for path in paths}
+            for future, path in futures.items():
+                try:
+                    future.result()
+                except Exception as e:
+                    num_failed += 1
+                    self.stderr.write('%s: %s' % (path, e))
+
+        self.stdout.write('Prepared %d photos' % (len(paths) - num_failed))
+
+        if num_failed:
+            raise CommandError('%d photos could not be prepared' % num_failed)
@@ -0,0 +1,45 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from registration.models import Event, Shift, HelperShift
+
+
+class Command(BaseCommand):
+    help = 'Verifies the stored number of helpers of all shifts and optionally rebuilds it'
+
+    def add_arguments(self, parser):
+        parser.add_argument('event_url_name', nargs='*', type=str,
+                            help="URL names of the events (default: all events)")
+        parser.add_argument('--rebuild', action='store_true',
+                            help="Recalculate the number of helpers of all shifts")
+
+    def handle(self, *args, **options):
+        shifts = Shift.objects.all()
+
+        if options['event_url_name']:
+            for event_url_name in options['event_url_name']:
+                if not Event.objects.filter(url_name=event_url_name).exists():
+                    raise CommandError('Event "%s" does not exist' % event_url_name)
+            shifts = shifts.filter(job__event__url_name__in=options['event_url_name'])
+
+        counts = HelperShift.objects.filter(shift=OuterRef('pk')).order_by().values('shift') \
+            .annotate(num=Count('pk')).values('num')
+        real_occupancy = Coalesce(Subquery(counts), 0)
+
+        if options['rebuild']:
+            with transaction.atomic():
+                num = shifts.update(occupancy=real_occupancy)
+            self.stdout.write('Rebuilt number of helpers for %d shifts' % num)
+            return
+
+        wrong_shifts = shifts.annotate(real_occupancy=real_occupancy).exclude(occupancy=F('real_occupancy')) \
+            .select_related('job__event')
+        for shift in wrong_shifts:
+            self.stdout.write('%s / %s: stored %d, registered %d' % (
+                shift.job.event.url_name, shift, shift.occupancy, shift.real_occupancy))
+
+        if wrong_shifts:
+            raise CommandError('Number of helpers is wrong for %d shifts, use --rebuild to fix it' %
+                               len(wrong_shifts))
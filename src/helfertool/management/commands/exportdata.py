@@ -3,12 +3,19 @@
 import csv
 import hashlib
 import os
+import shutil
 import string
+import tarfile
+import tempfile
+
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
 
 from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
 
-from registration.models import Event, HelperShift
-from gifts.models import HelpersGifts
+from registration.models import Event, HelperShift, Shift
+from gifts.models import HelpersGifts, IncludedGift
 
 
 def hash(data, salt):
@@ -26,17 +33,26 @@ class Command(BaseCommand):
     The following personal data is exported: shirt sizes, vegetarian, infection_instruction.
 
     The command will export multiple CSV files into a directory (optionally specified with --output).
+    With --archive, the CSV files are packed into a single compressed archive instead.
 
     The CSV files are meant for data analysis without leaking any personal data.
     Nevertheless, please review the files before giving them to someone!
+
+    The hash of every helper is computed only once, the rows are read with .iterator() and written directly, so
+    the memory usage does not depend on the size of the event. With --parallel, the hashes are computed and the
+    files are written in multiple threads.
     """
     def add_arguments(self, parser):
         parser.add_argument('event_url_name', type=str, help="URL name of the event")
         parser.add_argument('--output', type=str, help='The output directory (default: URL name of exported event)')
+        parser.add_argument('--parallel', action='store_true', help='Write all CSV files in parallel')
+        parser.add_argument('--archive', action='store_true',
+                            help='Write a single compressed archive (<output>.tar.gz) instead of a directory')
 
     def handle(self, *args, **options):
         event_url_name = options["event_url_name"]
         output_dir = options["output"]
+        parallel = options["parallel"]
 
         salt = os.urandom(16)
 
@@ -51,65 +67,152 @@ class Command(BaseCommand):
         if not output_dir:
             output_dir = event_url_name
 
+        if options["archive"]:
+            archive = "{output_dir}.tar.gz".format(**locals())
+            archive_name = os.path.basename(os.path.normpath(output_dir))
+            output_dir = tempfile.mkdtemp()
+        else:
+            archive = None
+
+            try:
+                os.mkdir(output_dir)
+            except FileExistsError:
+                pass
+
+        try:
+            # hash every helper only once, the hashes are used in multiple files
+            print("Hashing helpers...")
+            helper_pks = list(event.helper_set.values_list('pk', flat=True))
+            if parallel:
+                with ThreadPoolExecutor() as executor:
+                    hashes = dict(zip(helper_pks, executor.map(lambda pk: hash(pk, salt), helper_pks,
+                                                               chunksize=256)))
+            else:
+                hashes = {pk: hash(pk, salt) for pk in helper_pks}
+
+            # export
+            exports = [
+                self._export_helpers,
+                self._export_jobs,
+                self._export_shifts,
+                self._export_helper_shifts,
+                self._export_helper_gifts,
+            ]
+
+            if parallel:
+                with ThreadPoolExecutor(max_workers=len(exports)) as executor:
+                    futures = [executor.submit(self._run_in_thread, export, output_dir, event, hashes)
+                               for export in exports]
+                    for future in futures:
+                        future.result()
+            else:
+                for export in exports:
+                    export(output_dir, event, hashes)
+
+            if archive:
+                print("Writing archive {archive}...".format(**locals()))
+                with tarfile.open(archive, "w:gz") as tar:
+                    tar.add(output_dir, arcname=archive_name)
+        finally:
+            if archive:
+                shutil.rmtree(output_dir)
+
+        print("Done.")
+
+    def _run_in_thread(self, export, output_dir, event, hashes):
+        """ Runs one export in a separate thread, which has its own database connection. """
         try:
-            os.mkdir(output_dir)
-        except FileExistsError:
-            pass
+            export(output_dir, event, hashes)
+        finally:
+            connections.close_all()
 
-        # export
+    def _export_helpers(self, output_dir, event, hashes):
         print("Exporting helpers to {output_dir}/helper.csv...".format(**locals()))
         with open("{output_dir}/helper.csv".format(**locals()), 'w', newline='') as csvfile:
             writer = csv.writer(csvfile, delimiter=";")
             writer.writerow(["pk", "shirt", "vegetarian", "infection_instruction", "timestamp", "validated"])
-            for h in event.helper_set.all():
-                writer.writerow([hash(h.pk, salt), h.shirt, h.vegetarian, h.infection_instruction, h.timestamp,
-                                 h.validated])
 
+            helpers = event.helper_set.values_list('pk', 'shirt', 'vegetarian', 'infection_instruction', 'timestamp',
+                                                   'validated')
+            for pk, shirt, vegetarian, infection_instruction, timestamp, validated in helpers.iterator():
+                writer.writerow([hashes[pk], shirt, vegetarian, infection_instruction, timestamp, validated])
+
+    def _export_jobs(self, output_dir, event, hashes):
         print("Exporting jobs to {output_dir}/jobs.csv...".format(**locals()))
         with open("{output_dir}/jobs.csv".format(**locals()), 'w', newline='') as csvfile:
             writer = csv.writer(csvfile, delimiter=";")
             writer.writerow(["pk", "name", "infection_instruction"])
-            for j in event.job_set.all():
-                writer.writerow([j.pk, printable(j.name), j.infection_instruction])
+            for pk, name, infection_instruction in event.job_set.values_list('pk', 'name', 'infection_instruction'):
+                writer.writerow([pk, printable(name), infection_instruction])
 
+    def _export_shifts(self, output_dir, event, hashes):
         print("Exporting shifts to {output_dir}/shifts.csv...".format(**locals()))
         with open("{output_dir}/shifts.csv".format(**locals()), 'w', newline='') as csvfile:
             writer = csv.writer(csvfile, delimiter=";")
             writer.writerow(["pk", "job_pk", "name", "begin", "end", "number"])
-            for j in event.job_set.all():
-                for s in j.shift_set.all():
-                    writer.writerow([s.pk, j.pk, printable(s.name), s.begin, s.end, s.number])
 
+            shifts = Shift.objects.filter(job__event=event) \
+                .order_by('-job__order', 'job__pk', 'begin', 'end', 'pk') \
+                .values_list('pk', 'job_id', 'name', 'begin', 'end', 'number')
+            for pk, job_pk, name, begin, end, number in shifts.iterator():
+                writer.writerow([pk, job_pk, printable(name), begin, end, number])
+
+    def _export_helper_shifts(self, output_dir, event, hashes):
         print("Exporting helper shifts to {output_dir}/helper_shifts.csv...".format(**locals()))
         with open("{output_dir}/helper_shifts.csv".format(**locals()), 'w', newline='') as csvfile:
             writer = csv.writer(csvfile, delimiter=";")
             writer.writerow(["helper_pk", "shift_pk", "timestamp"])
-            for j in event.job_set.all():
-                for s in j.shift_set.all():
-                    for h in HelperShift.objects.filter(shift=s):
-                        writer.writerow([hash(h.helper.pk, salt), s.pk, h.timestamp])
 
+            helpershifts = HelperShift.objects.filter(shift__job__event=event) \
+                .order_by('-shift__job__order', 'shift__job__pk', 'shift__begin', 'shift__end', 'shift__pk', 'pk') \
+                .values_list('helper_id', 'shift_id', 'timestamp')
+            for helper_pk, shift_pk, timestamp in helpershifts.iterator():
+                writer.writerow([hashes[helper_pk], shift_pk, timestamp])
+
+    def _export_helper_gifts(self, output_dir, event, hashes):
+        """ Exports the number of deserved gifts per helper.
+
+        For every shift of a helper, the helper deserves the gift sets of this shift (this is what
+        `HelpersGifts.update` synchronises). The numbers are calculated from the shifts here, so the database is not
+        modified and only a few queries are necessary.
+        """
         print("Exporting helper gifts to {output_dir}/helper_gifts.csv...".format(**locals()))
         with open("{output_dir}/helper_gifts.csv".format(**locals()), 'w', newline='') as csvfile:
             writer = csv.writer(csvfile, delimiter=";")
             gifttypes = [g.name for g in event.gift_set.all()]
             writer.writerow(["helper_pk"] + [printable(g) for g in gifttypes])
-            for h in event.helper_set.all():
-                gifts = dict.fromkeys(gifttypes, 0)
-                try:
-                    hg = HelpersGifts.objects.get(helper=h)
-                    hg.update()
 
-                    for deserved in hg.deservedgiftset_set.all():
-                        for gift in deserved.gift_set.gifts.all():
-                            num = deserved.gift_set.get_gift_num(gift)
-                            name = gift.name
-                            gifts[name] += num
-
-                    data = [gifts[name] for name in gifttypes]
-                    writer.writerow([hash(h.pk, salt)] + data)
-
-                except HelpersGifts.DoesNotExist:
-                    pass
-
-        print("Done.")
+            # number of gifts per gift set
+            gifts_per_set = defaultdict(list)
+            included = IncludedGift.objects.filter(gift_set__event=event) \
+                .values_list('gift_set_id', 'gift__name', 'count')
+            for gift_set_pk, name, count in included:
+                gifts_per_set[gift_set_pk].append((name, count))
+
+            # gift sets per shift
+            sets_per_shift = defaultdict(list)
+            shift_sets = Shift.gifts.through.objects.filter(shift__job__event=event) \
+                .values_list('shift_id', 'giftset_id')
+            for shift_pk, gift_set_pk in shift_sets:
+                sets_per_shift[shift_pk].append(gift_set_pk)
+
+            # only helpers that have gifts data are exported
+            helpers_with_gifts = set(HelpersGifts.objects.filter(helper__event=event)
+                                     .values_list('helper_id', flat=True))
+
+            # sum up the gifts of all shifts of the helpers
+            helper_gifts = {pk: dict.fromkeys(gifttypes, 0) for pk in helpers_with_gifts}
+            helpershifts = HelperShift.objects.filter(helper__event=event).values_list('helper_id', 'shift_id')
+            for helper_pk, shift_pk in helpershifts.iterator():
+                gifts = helper_gifts.get(helper_pk)
+                if gifts is None:
+                    continue
+
+                for gift_set_pk in sets_per_shift[shift_pk]:
+                    for name, count in gifts_per_set[gift_set_pk]:
+                        gifts[name] += count
+
+            for helper_pk in event.helper_set.values_list('pk', flat=True).iterator():
+                if helper_pk in helper_gifts:
+                    gifts = helper_gifts[helper_pk]
+                    writer.writerow([hashes[helper_pk]] + [gifts[name] for name in gifttypes])
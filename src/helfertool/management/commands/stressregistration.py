@@ -0,0 +1,121 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, connections, transaction
+from django.db.models import Count
+from django.utils import timezone
+from django.utils.crypto import get_random_string
+
+from datetime import timedelta
+import multiprocessing
+import random
+
+from registration.exceptions import ShiftFull
+from registration.models import Event, Job, Shift, Helper
+
+
+def _new_helper(event, name):
+    return Helper(event=event, firstname=name, surname="Stresstest", email="stresstest@localhost",
+                  phone="0", privacy_statement=True)
+
+
+def _register(event_pk, shift_pks, num_registrations, barrier, results):
+    """ Registers helpers in a separate process, the number of saved, rejected and failed registrations and the
+    errors are written to `results`. """
+    # every process needs its own database connection
+    connections.close_all()
+
+    event = Event.objects.get(pk=event_pk)
+    shifts = list(Shift.objects.filter(pk__in=shift_pks))
+    saved, rejected, errors = 0, 0, []
+
+    # all processes start at the same time
+    barrier.wait()
+
+    for i in range(num_registrations):
+        selected = random.sample(shifts, random.randint(1, len(shifts)))
+
+        try:
+            if i % 2 == 0:
+                # public registration (see RegisterForm.save)
+                with transaction.atomic():
+                    helper = _new_helper(event, "Public")
+                    helper.save()
+                    helper.add_shifts(selected)
+            else:
+                # shifts added to an existing helper (see HelperAddShiftForm.save)
+                helper = _new_helper(event, "Admin")
+                helper.save()
+                helper.add_shifts(selected)
+            saved += 1
+        except ShiftFull:
+            rejected += 1
+        except Exception as e:
+            errors.append("%s: %s" % (type(e).__name__, e))
+
+    connections.close_all()
+    results.put((saved, rejected, errors))
+
+
+class Command(BaseCommand):
+    help = 'Registers helpers from multiple processes at the same time and checks that no shift is overbooked ' \
+           '(uses a temporary event in the configured database)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--processes', type=int, default=8,
+                            help="Number of parallel processes (default: 8)")
+        parser.add_argument('--registrations', type=int, default=25,
+                            help="Number of registrations per process (default: 25)")
+        parser.add_argument('--shifts', type=int, default=3,
+                            help="Number of shifts, every registration selects some of them (default: 3)")
+        parser.add_argument('--places', type=int, default=20,
+                            help="Number of helpers per shift (default: 20)")
+
+    def handle(self, *args, **options):
+        event = Event.objects.create(name="Stresstest", url_name="stresstest%s" % get_random_string(8),
+                                     date=timezone.now().date())
+
+        try:
+            job = Job.objects.create(event=event, name="Stresstest", public=True)
+            begin = timezone.now()
+            shift_pks = [Shift.objects.create(job=job, begin=begin + timedelta(hours=i),
+                                              end=begin + timedelta(hours=i + 1), number=options['places']).pk
+                         for i in range(options['shifts'])]
+
+            # the connection must not be shared with the new processes
+            connections.close_all()
+
+            ctx = multiprocessing.get_context('fork')
+            barrier = ctx.Barrier(options['processes'])
+            results = ctx.Queue()
+            processes = [ctx.Process(target=_register, args=(event.pk, shift_pks, options['registrations'],
+                                                             barrier, results))
+                         for i in range(options['processes'])]
+            for p in processes:
+                p.start()
+            process_results = [results.get() for p in processes]
+            for p in processes:
+                p.join()
+
+            saved = sum(r[0] for r in process_results)
+            rejected = sum(r[1] for r in process_results)
+            errors = [e for r in process_results for e in r[2]]
+
+            self.stdout.write('Database: %s' % connection.vendor)
+            self.stdout.write('Registrations: %d saved, %d rejected (shift full), %d failed' %
+                              (saved, rejected, len(errors)))
+            for error in sorted(set(errors)):
+                self.stdout.write('  %dx %s' % (errors.count(error), error))
+
+            overbooked = 0
+            shifts = Shift.objects.filter(pk__in=shift_pks).annotate(num_helpers_real=Count('helper'))
+            for shift in shifts.order_by('pk'):
+                self.stdout.write('Shift %d: %d of %d places, stored number of helpers: %d' % (
+                    shift.pk, shift.num_helpers_real, shift.number, shift.occupancy))
+                if shift.num_helpers_real > shift.number or shift.occupancy != shift.num_helpers_real:
+                    overbooked += 1
+        finally:
+            event.delete()
+
+        if overbooked:
+            raise CommandError('%d shifts are overbooked or have a wrong number of helpers' % overbooked)
+        if errors:
+            raise CommandError('%d registrations failed' % len(errors))
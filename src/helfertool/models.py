@@ -0,0 +1,152 @@
+from django.conf import settings
+from django.db import models
+from django.utils import timezone
+from django.utils.translation import ugettext_lazy as _
+
+from datetime import timedelta
+
+import hashlib
+import os
+import uuid
+
+
+class Artifact(models.Model):
+    """ A file that is generated in the background and downloaded later by its owner (e.g. badges or exports).
+
+    The object is created when the generation is started and updated by the task with `finish` or `fail`. Files
+    and objects are deleted by `helfertool.tasks.sweep_artifacts` after `expires`, pending objects expire after
+    `PENDING_TIMEOUT`. Subclasses define `path` and delete the file in a `post_delete` handler.
+    """
+    STATE_PENDING = "PENDING"
+    STATE_FINISHED = "FINISHED"
+    STATE_FAILED = "FAILED"
+
+    STATE_CHOICES = (
+        (STATE_PENDING, _("Pending")),
+        (STATE_FINISHED, _("Finished")),
+        (STATE_FAILED, _("Failed")),
+    )
+
+    # expiry of pending artifacts, the task sets the real expiry after the generation
+    PENDING_TIMEOUT = timedelta(days=1)
+
+    class Meta:
+        abstract = True
+        ordering = ['-created']
+
+    id = models.UUIDField(
+        primary_key=True,
+        default=uuid.uuid4,
+        editable=False,
+    )
+
+    event = models.ForeignKey(
+        'registration.Event',
+        on_delete=models.CASCADE,
+    )
+
+    owner = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+    )
+
+    # name to be displayed in web interface
+    name = models.CharField(
+        max_length=250,
+    )
+
+    # filename for download (without extension)
+    filename = models.CharField(
+        max_length=250,
+        blank=True,
+    )
+
+    state = models.CharField(
+        max_length=20,
+        choices=STATE_CHOICES,
+        default=STATE_PENDING,
+    )
+
+    error = models.TextField(
+        blank=True,
+    )
+
+    size = models.BigIntegerField(
+        null=True,
+        blank=True,
+    )
+
+    checksum = models.CharField(
+        max_length=64,
+        blank=True,
+    )
+
+    downloaded = models.BooleanField(
+        default=False,
+    )
+
+    created = models.DateTimeField(
+        auto_now_add=True,
+    )
+
+    expires = models.DateTimeField()
+
+    def __str__(self):
+        return "{} - {}".format(self.event, self.name)
+
+    @property
+    def path(self):
+        raise NotImplementedError
+
+    @property
+    def finished(self):
+        return self.state == Artifact.STATE_FINISHED
+
+    @property
+    def failed(self):
+        return self.state == Artifact.STATE_FAILED
+
+    @property
+    def expired(self):
+        return self.expires < timezone.now()
+
+    def delete_file(self):
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
+
+    def finish(self, filename, timeout, **fields):
+        """ Marks the artifact as finished after the file was written to `path`, it expires after `timeout` seconds.
+
+        The object is only updated in the database, so it is not created again if it was deleted in the meantime.
+        In this case, the file is deleted and False is returned.
+        """
+        checksum = hashlib.sha256()
+        try:
+            with open(self.path, 'rb') as f:
+                for block in iter(lambda: f.read(65536), b''):
+                    checksum.update(block)
+                size = f.tell()
+        except FileNotFoundError:
+            # the file was deleted together with the object while it was written
+            return False
+
+        updated = type(self).objects.filter(pk=self.pk).update(
+            state=Artifact.STATE_FINISHED, filename=filename, size=size, checksum=checksum.hexdigest(),
+            expires=timezone.now() + timedelta(seconds=timeout), **fields)
+
+        if not updated:
+            self.delete_file()
+            return False
+        return True
+
+    def fail(self, **fields):
+        """ Marks the artifact as failed, like `finish` only in the database. """
+        type(self).objects.filter(pk=self.pk).update(state=Artifact.STATE_FAILED, **fields)
+
+    @classmethod
+    def sweep(cls):
+        """ Deletes the expired objects, the files are deleted by the `post_delete` handlers. """
+        for artifact in cls.objects.filter(expires__lt=timezone.now()):
+            artifact.delete()
@@ -67,6 +67,9 @@ FILE_UPLOAD_PERMISSIONS = 0o640
 FILE_UPLOAD_DIRECTORY_PERMISSIONS = 0o750
 FILE_UPLOAD_TEMP_DIR = TMP_ROOT
 
+# deletion of files that were generated in the background (see helfertool.models.Artifact)
+ARTIFACT_SWEEP_INTERVAL = 60 * dict_get(config, 5, 'files', 'sweep_interval')
+
 # internationalization
 LANGUAGE_CODE = dict_get(config, 'de', 'language', 'default')
 
@@ -127,6 +130,15 @@ CACHES = {
         'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
         'LOCATION': 'locks_cache',
     },
+    # cache for the registration form and the data versions of events (shared by all workers)
+    'registration': {
+        'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+        'LOCATION': 'registration_cache',
+        'TIMEOUT': 60*60,
+        'OPTIONS': {
+            'MAX_ENTRIES': 10000,
+        },
+    },
 }
 
 # mail
@@ -464,13 +476,30 @@ if SEARCH_SIMILARITY_DISABLED is False:
     else:
         SEARCH_SIMILARITY_DISABLED = True
 
+# export of helpers
+EXPORT_FILE_TIMEOUT = 60 * dict_get(config, 30, 'export', 'file_timeout')
+EXPORT_SYNC_MAX_HELPERS = dict_get(config, 500, 'export', 'sync_max_helpers')
+EXPORT_CACHE_TIMEOUT = 60 * dict_get(config, 24 * 60, 'export', 'cache_timeout')
+EXPORT_CACHE_DIR = os.path.join(TMP_ROOT, 'export_cache')
+EXPORT_ARTIFACT_DIR = os.path.join(TMP_ROOT, 'export_artifacts')
+
 # badges
 BADGE_PDFLATEX = dict_get(config, '/usr/bin/pdflatex', 'badges', 'pdflatex')
+BADGE_NATIVE_FONT = dict_get(config, '/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf', 'badges', 'native_font')
 BADGE_PHOTO_MAX_SIZE = dict_get(config, 1000, 'badges', 'photo_max_size')
+BADGE_PHOTO_JPEG_QUALITY = dict_get(config, 90, 'badges', 'photo_jpeg_quality')
+BADGE_PHOTO_CACHE_DIR = os.path.join(TMP_ROOT, 'badge_photos')
+BADGE_PHOTO_CACHE_TIMEOUT = 60 * dict_get(config, 30 * 24 * 60, 'badges', 'photo_cache_timeout')
 BADGE_SPECIAL_MAX = dict_get(config, 50, 'badges', 'special_badges_max')
 
+BADGE_PDFLATEX_PROCESSES = dict_get(config, 1, 'badges', 'pdflatex_processes')
+BADGE_CHUNK_PAGES = dict_get(config, 50, 'badges', 'chunk_pages')
+
+BADGE_PAGE_CACHE_SIZE = dict_get(config, 0, 'badges', 'page_cache_size')
+BADGE_PAGE_CACHE_DIR = os.path.join(TMP_ROOT, 'badge_cache')
+
 BADGE_PDF_TIMEOUT = 60 * dict_get(config, 30, 'badges', 'pdf_timeout')
-BADGE_RM_DELAY = 60 * dict_get(config, 2, 'badges', 'rm_delay')
+BADGE_ARTIFACT_DIR = os.path.join(TMP_ROOT, 'badge_artifacts')
 
 BADGE_DEFAULT_TEMPLATE = build_path(
     dict_get(config, 'src/badges/latextemplate/badge.tex', 'badges',
@@ -0,0 +1,19 @@
+var export_counter = 0;
+var export_timer;
+
+function reload_export_tasklist()
+{
+    var url = $("#export-tasks").data("url");
+    $("#export-tasks").load(url, function() {
+        export_counter++;
+
+        // stop reloading if all exports are finished or after 20 minutes
+        if($("#export-tasks .export-running").length == 0 || export_counter >= 600)
+        {
+            clearInterval(export_timer);
+        }
+    });
+}
+
+reload_export_tasklist();
+export_timer = setInterval(reload_export_tasklist, 2000);
@@ -0,0 +1,29 @@
+// load the shifts and helpers of a day when it is opened for the first time
+function load_helpers_day(day)
+{
+    if(day.data("loaded"))
+    {
+        return;
+    }
+    day.data("loaded", true);
+
+    day.load(day.data("url"), function() {
+        init_helpers_tables(day);
+    });
+}
+
+$(function () {
+    $(".helpers-day").on("show.bs.collapse", function() {
+        load_helpers_day($(this));
+    });
+
+    $(".helpers-day.show").each(function() {
+        load_helpers_day($(this));
+    });
+
+    // open days that are selected with the jump labels
+    if(window.location.hash)
+    {
+        $("#day-" + window.location.hash.substring(1)).collapse("show");
+    }
+});
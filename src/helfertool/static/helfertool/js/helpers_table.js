@@ -1,5 +1,6 @@
-$(function () {
-    $(".table").DataTable({
+function init_helpers_tables(parent)
+{
+    $(parent).find(".table").DataTable({
         "paging": false,
         "searching": false,
         "info": false,
@@ -9,4 +10,8 @@ $(function () {
         ],
         "sorting": [[2, 'asc'], [1, 'asc']],
     });
+}
+
+$(function () {
+    init_helpers_tables(document);
 });
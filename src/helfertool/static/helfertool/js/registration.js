@@ -80,6 +80,54 @@ $('input.registration_possible').each(function (i, element) {
     });
 });
 
+/* Automatic update of full shifts */
+var availability_url = $('#register_form').data('availability-url');
+
+function apply_availability(shifts) {
+    $.each(shifts, function(i, shift) {
+        var field = $('#id_shift_' + shift.id);
+
+        // update number of helpers
+        if (shift.occupancy !== null) {
+            field.parent().find('.badge').text(shift.occupancy + '/' + shift.capacity);
+        }
+
+        // disable full shifts, but not if they are selected already (the server shows an error then).
+        // the class registration_possible is removed, so the check for overlapping shifts ignores it.
+        if (shift.full && !field.prop('checked')) {
+            field.prop('disabled', true);
+            field.removeClass('registration_possible');
+            field.parent().addClass('full');
+        }
+    });
+}
+
+function update_availability() {
+    // the server sends an ETag, so unchanged data is not transferred again
+    $.ajax({
+        url: availability_url,
+        dataType: 'json',
+        ifModified: true,
+        success: function(data, status) {
+            if (status === 'notmodified' || !data || !data.shifts) {
+                return;
+            }
+
+            apply_availability(data.shifts);
+        }
+    });
+}
+
+// the cached shifts of the form do not contain the number of helpers, it is sent separately
+var initial_availability = $('#shift-availability');
+if (initial_availability.length) {
+    apply_availability(JSON.parse(initial_availability.text()));
+}
+
+if (availability_url) {
+    setInterval(update_availability, 30000);
+}
+
 /* Infection instruction field */
 function handle_infection_instruction()
 {
@@ -0,0 +1,19 @@
+from __future__ import absolute_import
+
+from celery import shared_task
+
+from django.apps import apps
+
+from .models import Artifact
+
+
+@shared_task
+def sweep_artifacts():
+    """ Deletes the expired files that were generated in the background, like badges or exports (periodic task).
+
+    Pending artifacts expire only after `Artifact.PENDING_TIMEOUT`, so they are not deleted while the generation
+    waits for a worker.
+    """
+    for model in apps.get_models():
+        if issubclass(model, Artifact):
+            model.sweep()
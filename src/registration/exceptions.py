@@ -0,0 +1,5 @@
+class ShiftFull(Exception):
+    """ The helper cannot be added to the shift since it is full (or blocked). """
+    def __init__(self, shift):
+        super(ShiftFull, self).__init__(str(shift))
+        self.shift = shift
@@ -0,0 +1,95 @@
+from django.conf import settings
+
+import hashlib
+import os
+import shutil
+import tempfile
+import time
+
+from ..utils import get_event_version
+
+
+def get_export_cache_key(event, job, date, filetype, language):
+    """ Returns the key of an export in the export cache.
+
+    The key contains the data version of the event (see `registration.utils.get_event_version`), so the cached
+    file is not used anymore after the helpers, shifts or coordinators were changed.
+
+    The event and the data version are also part of the filename, so the files of an event or of old versions
+    can be deleted (see `delete_event_exports` and `store_export`).
+    """
+    version = get_event_version(event.pk)
+    parts = [event.pk, job.pk if job else None, date, filetype, language, version]
+    return "{}_{}_{}".format(event.pk, version, hashlib.sha1(repr(parts).encode()).hexdigest())
+
+
+def _get_path(key):
+    return os.path.join(settings.EXPORT_CACHE_DIR, key)
+
+
+def get_cached_export(key):
+    """ Returns the path of the cached export or None. """
+    path = _get_path(key)
+    if os.path.isfile(path):
+        return path
+    return None
+
+
+def store_export(key, write_func):
+    """ Creates a file in the export cache and returns the path.
+
+    `write_func` is called with the opened file. The file is written to a temporary file first, so parallel
+    requests never read incomplete files. Files of the same event with an older data version are deleted.
+    """
+    os.makedirs(settings.EXPORT_CACHE_DIR, exist_ok=True)
+
+    event_prefix = "{}_".format(key.split('_')[0])
+    version_prefix = "{}_".format(key.rsplit('_', 1)[0])
+    _delete_files(lambda entry: entry.name.startswith(event_prefix) and not entry.name.startswith(version_prefix))
+
+    fd, tmp_path = tempfile.mkstemp(dir=settings.EXPORT_CACHE_DIR, prefix=".tmp")
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            write_func(f)
+        os.replace(tmp_path, _get_path(key))
+    except Exception:
+        os.remove(tmp_path)
+        raise
+
+    return _get_path(key)
+
+
+def store_export_file(key, src_path):
+    """ Adds an existing file to the export cache (see `store_export`). """
+    def _copy(f):
+        with open(src_path, 'rb') as src:
+            shutil.copyfileobj(src, f)
+
+    return store_export(key, _copy)
+
+
+def delete_event_exports(event_pk):
+    """ Delete all cached files of the event. """
+    prefix = "{}_".format(event_pk)
+    _delete_files(lambda entry: entry.name.startswith(prefix))
+
+
+def cleanup():
+    """ Delete all files that are older than `EXPORT_CACHE_TIMEOUT` (also left temporary files). """
+    min_mtime = time.time() - settings.EXPORT_CACHE_TIMEOUT
+    _delete_files(lambda entry: entry.stat().st_mtime < min_mtime)
+
+
+def _delete_files(condition):
+    """ Delete the files in the export cache, for which `condition` returns True for the `os.DirEntry`. """
+    if not os.path.isdir(settings.EXPORT_CACHE_DIR):
+        return
+
+    with os.scandir(settings.EXPORT_CACHE_DIR) as entries:
+        for entry in entries:
+            try:
+                if entry.is_file() and condition(entry):
+                    os.remove(entry.path)
+            except FileNotFoundError:
+                # deleted by another process
+                pass
@@ -1,3 +1,4 @@
+from django.db.models import Count
 from django.template import defaultfilters as filters
 from django.utils.translation import ugettext as _
 import re
@@ -49,22 +50,35 @@ def escape(payload):
     return payload
 
 
-def xlsx(buffer, event, jobs, date):
+def xlsx(buffer, event, jobs, date, progress=None):
     """ Exports the helpers for given jobs of an event as excel spreadsheet.
 
+    The workbook is written in the constant memory mode of xlsxwriter, so the rows are flushed to temporary
+    files and the memory usage does not grow with the number of helpers. Therefore, all rows of a worksheet must
+    be written in ascending order.
+
     Parameter:
-        buffer: a writeable bytes buffer (e.g. io.BytesIO or a file)
+        buffer: a writeable bytes buffer (preferably a file, e.g. tempfile.TemporaryFile)
         event:  the exported event
         jobs:   a list of all exported jobs
+        date:   export only shifts of this day (or None)
+        progress: optional function that is called with the number of finished and all jobs
     """
     # create xlsx
-    workbook = xlsxwriter.Workbook(buffer)
+    workbook = xlsxwriter.Workbook(buffer, {'constant_memory': True})
+
+    # number of shifts and coordinated jobs per helper (to mark helpers with multiple shifts)
+    helper_counts = event.helper_set.annotate(num_shifts=Count('shifts', distinct=True),
+                                              num_jobs=Count('job', distinct=True))
+    num_shifts_and_jobs = {pk: num_shifts + num_jobs for pk, num_shifts, num_jobs in
+                           helper_counts.values_list('pk', 'num_shifts', 'num_jobs')}
 
     # duplicated worksheet names are not allowed
     used_names = []
 
     # export jobs
-    for job in jobs:
+    num_jobs = len(jobs)
+    for job_number, job in enumerate(jobs):
         # find unique worksheet name
         job_name = cleanName(job.name)[:20]  # worksheet name must be <= 31 chars
 
@@ -123,7 +137,7 @@ def xlsx(buffer, event, jobs, date):
             worksheet.merge_range(row.next(), 0, row.get(), last_column,
                                   _("Coordinators"), bold)
             add_helpers(worksheet, row, column, event, job,
-                        job.coordinators.all(), multiple_shifts)
+                        job.coordinators.all(), multiple_shifts, num_shifts_and_jobs)
 
         # show all shifts
         for shift in job.shift_set.order_by('begin'):
@@ -133,22 +147,23 @@ def xlsx(buffer, event, jobs, date):
             worksheet.merge_range(row.next(), 0, row.get(),
                                   last_column, shift.time(), bold)
             add_helpers(worksheet, row, column, event, job,
-                        shift.helper_set.all(), multiple_shifts)
+                        shift.helper_set.all(), multiple_shifts, num_shifts_and_jobs)
+
+        if progress:
+            progress(job_number + 1, num_jobs)
 
     # close xlsx
     workbook.close()
 
 
 def add_helpers(worksheet, row, column, event, job, helpers,
-                multiple_shifts_format):
+                multiple_shifts_format, num_shifts_and_jobs):
     for helper in helpers:
         row.next()
         column.reset()
 
-        num_shifts = helper.shifts.count()
-        num_jobs = len(helper.coordinated_jobs)
         format = None
-        if num_shifts + num_jobs > 1:
+        if num_shifts_and_jobs.get(helper.pk, 0) > 1:
             format = multiple_shifts_format
 
         worksheet.write(row.get(), column.next(), escape(helper.firstname),
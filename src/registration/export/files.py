@@ -0,0 +1,51 @@
+from ..utils import escape_filename
+from .excel import xlsx
+from .pdf import pdf
+
+FILETYPES = {
+    'excel': ('xlsx', 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'),
+    'pdf': ('pdf', 'application/pdf'),
+}
+
+
+def get_export_jobs(event, job=None, date=None):
+    """ Returns the jobs that are exported and the filename without extension.
+
+    Parameter:
+        event: the exported event
+        job:   a single exported job or None for all jobs
+        date:  export only shifts of this day or None for all days
+    """
+    if job:
+        jobs = [job, ]
+        filename = "%s - %s" % (event.name, job.name)
+    else:
+        jobs = event.job_set.all()
+        filename = event.name
+
+    if date:
+        # if all jobs are shown, exclude all jobs without shifts on this day
+        if not job:
+            jobs = jobs.filter(shift__begin__date=date).distinct()
+
+        filename = "{} - {}_{:02d}_{:02d}".format(filename, date.year,
+                                                  date.month, date.day)
+
+    return jobs, escape_filename(filename)
+
+
+def write_export(buffer, filetype, event, jobs, date, progress=None):
+    """ Writes the export as `filetype` ("excel" or "pdf") to `buffer`.
+
+    `progress` is called with the number of finished jobs and the total number of jobs.
+
+    Returns the file extension and the content type.
+    """
+    if filetype == 'excel':
+        xlsx(buffer, event, jobs, date, progress)
+    elif filetype == 'pdf':
+        pdf(buffer, event, jobs, date, progress)
+    else:
+        raise ValueError("Invalid filetype")
+
+    return FILETYPES[filetype]
@@ -65,7 +65,7 @@ def table_of_helpers(elements, helpers, event):
     add_table(elements, data, spaces)
 
 
-def pdf(buffer, event, jobs, date):
+def pdf(buffer, event, jobs, date, progress=None):
     doc = SimpleDocTemplate(buffer, topMargin=margin, rightMargin=margin,
                             bottomMargin=margin, leftMargin=margin)
     doc.pagesize = A4
@@ -74,7 +74,8 @@ def pdf(buffer, event, jobs, date):
     elements = []
 
     # iterate over jobs
-    for job in jobs:
+    num_jobs = len(jobs)
+    for job_number, job in enumerate(jobs):
         # heading
         heading = h1("%s" % job.name)
         elements.append(heading)
@@ -103,5 +104,8 @@ def pdf(buffer, event, jobs, date):
         # page break
         elements.append(PageBreak())
 
+        if progress:
+            progress(job_number + 1, num_jobs)
+
     # build pdf
     doc.build(elements)
@@ -0,0 +1,103 @@
+from django.template import defaultfilters as filters
+from django.utils.timezone import localtime
+
+import csv
+import json
+
+from .excel import escape
+from ..models import HelperShift
+
+STREAM_FILETYPES = {
+    'csv': ('csv', 'text/csv; charset=utf-8'),
+    'jsonl': ('jsonl', 'application/x-ndjson; charset=utf-8'),
+}
+
+
+class Echo:
+    """ File-like object that returns the written value instead of buffering it (for `csv.writer`). """
+    def write(self, value):
+        return value
+
+
+def _get_columns(event, jobs):
+    """ Returns the exported columns, the optional columns depend on the event settings. """
+    columns = ['job', 'shift', 'begin', 'end', 'firstname', 'surname', 'email']
+
+    if event.ask_phone:
+        columns.append('phone')
+    if event.ask_shirt:
+        columns.append('shirt')
+    if event.ask_vegetarian:
+        columns.append('vegetarian')
+    if any(job.infection_instruction for job in jobs):
+        columns.append('infection_instruction')
+
+    columns.extend(['comment', 'present'])
+    return columns
+
+
+def _get_rows(event, jobs, date, columns):
+    """ Yields one dict per helper and shift.
+
+    All helpers are loaded with one query (joined with the shifts and jobs), the result is not cached by the
+    queryset, so the memory usage does not depend on the number of helpers. Texts entered by the helpers are
+    escaped like in the Excel export.
+    """
+    helpershifts = HelperShift.objects.filter(shift__job__in=jobs) \
+        .select_related('helper', 'shift', 'shift__job') \
+        .order_by('-shift__job__order', 'shift__job__pk', 'shift__begin', 'shift__pk', 'helper__surname',
+                  'helper__firstname')
+    if date:
+        helpershifts = helpershifts.filter(shift__begin__date=date)
+
+    for helpershift in helpershifts.iterator():
+        helper = helpershift.helper
+        shift = helpershift.shift
+        job = shift.job
+
+        row = {
+            'job': escape(job.name),
+            'shift': escape(shift.name),
+            'begin': localtime(shift.begin).isoformat(),
+            'end': localtime(shift.end).isoformat(),
+            'firstname': escape(helper.firstname),
+            'surname': escape(helper.surname),
+            'email': escape(helper.email),
+            'phone': escape(helper.phone),
+            'shirt': escape(str(helper.get_shirt_display())),
+            'vegetarian': escape(filters.yesno(helper.vegetarian)),
+            'infection_instruction': escape(str(helper.get_infection_instruction_short()))
+            if job.infection_instruction else "",
+            'comment': escape(helper.comment),
+            'present': escape(filters.yesno(helpershift.present)),
+        }
+
+        yield {column: row[column] for column in columns}
+
+
+def csv_stream(event, jobs, date):
+    """ Yields the lines of the CSV export of the helpers for the given jobs (and day, if `date` is set). """
+    columns = _get_columns(event, jobs)
+    writer = csv.DictWriter(Echo(), fieldnames=columns)
+
+    yield writer.writerow(dict(zip(columns, columns)))
+    for row in _get_rows(event, jobs, date, columns):
+        yield writer.writerow(row)
+
+
+def jsonl_stream(event, jobs, date):
+    """ Yields the lines of the JSON Lines export, every line contains one helper in one shift. """
+    columns = _get_columns(event, jobs)
+
+    for row in _get_rows(event, jobs, date, columns):
+        yield json.dumps(row, ensure_ascii=False) + "\n"
+
+
+def export_stream(filetype, event, jobs, date):
+    """ Returns an iterator over the export as `filetype` ("csv" or "jsonl"). """
+    if filetype == 'csv':
+        return csv_stream(event, jobs, date)
+    elif filetype == 'jsonl':
+        return jsonl_stream(event, jobs, date)
+    else:
+        raise ValueError("Invalid filetype")
@@ -3,7 +3,7 @@ from .event import EventForm, EventAdminRolesForm, EventAdminRolesAddForm, Event
 from .job import JobForm, JobDeleteForm, JobDuplicateForm, JobDuplicateDayForm, JobSortForm
 from .shift import ShiftForm, ShiftDeleteForm
 from .helper import HelperForm, HelperDeleteForm, HelperDeleteCoordinatorForm, HelperAddShiftForm, \
-    HelperAddCoordinatorForm, HelperSearchForm, HelperResendMailForm, HelperInternalCommentForm
+    HelperAddCoordinatorForm, HelperSearchForm, HelperResendMailForm, HelperInternalCommentForm, HelperFilterForm
 from .link import LinkForm, LinkDeleteForm
 from .registration import RegisterForm, DeregisterForm
 from .duplicates import MergeDuplicatesForm
@@ -7,7 +7,8 @@ from django.db.models.functions import Greatest
 from django.utils.translation import ugettext_lazy as _
 
 from ..models import Helper, Shift, Job
-from ..permissions import has_access, ACCESS_HELPER_VIEW, ACCESS_JOB_EDIT_HELPERS
+from ..permissions import has_access, filter_helpers_with_access, ACCESS_HELPER_VIEW, ACCESS_JOB_EDIT_HELPERS
+from ..utils import find_overlapping_shifts
 from badges.models import Badge
 
 import logging
@@ -120,9 +121,23 @@ class HelperAddShiftForm(forms.Form):
             if shift.is_full():
                 raise ValidationError(_("This shift if already full: {}".format(shift)))
 
+        # check for overlapping shifts, including the current shifts of the helper. if the current shifts
+        # overlap already (added before the setting was changed), only the new shifts are checked.
+        max_overlap = self.helper.event.max_overlapping
+        if max_overlap is not None:
+            shifts = list(self.cleaned_data.get('shifts'))
+            current_shifts = list(self.helper.shifts.all())
+            if not find_overlapping_shifts(current_shifts, max_overlap):
+                shifts += current_shifts
+
+            if find_overlapping_shifts(shifts, max_overlap):
+                raise ValidationError(_("The selected shifts overlap with each other or with the current shifts "
+                                        "of the helper by more than %(minutes)d minutes.") %
+                                      {'minutes': max_overlap})
+
     def save(self):
-        for shift in self.cleaned_data.get('shifts'):
-            self.helper.shifts.add(shift)
+        # raises ShiftFull if a shift was filled up since the validation
+        self.helper.add_shifts(self.cleaned_data.get('shifts'))
         self.helper.save()
 
 
@@ -277,9 +292,56 @@ class HelperSearchForm(forms.Form):
                 | Q(phone__icontains=p)
             ).order_by('-similarity')
 
-        data = filter(lambda h: has_access(self.user, h, ACCESS_HELPER_VIEW), data)
+        return filter_helpers_with_access(self.user, self.event, data, ACCESS_HELPER_VIEW)
+
+
+class HelperFilterForm(forms.Form):
+    """ Filter for the helpers of a job (see `registration.views.helpers_for_job`). """
+    PRESENCE_PRESENT = "present"
+    PRESENCE_ABSENT = "absent"
+    PRESENCE_UNKNOWN = "unknown"
+
+    PRESENCE_CHOICES = (
+        ("", _("All helpers")),
+        (PRESENCE_PRESENT, _("Present")),
+        (PRESENCE_ABSENT, _("Absent")),
+        (PRESENCE_UNKNOWN, _("Presence not set")),
+    )
+
+    name = forms.CharField(
+        required=False,
+        max_length=100,
+        label=_("Name"),
+    )
+
+    presence = forms.ChoiceField(
+        required=False,
+        choices=PRESENCE_CHOICES,
+        label=_("Presence"),
+    )
+
+    def is_active(self):
+        return self.is_valid() and any(self.cleaned_data.values())
+
+    def filter(self, helpershifts):
+        """ Apply the filter to a queryset of `HelperShift` objects (in the database). """
+        if not self.is_valid():
+            return helpershifts
+
+        name = self.cleaned_data.get('name')
+        if name:
+            helpershifts = helpershifts.filter(Q(helper__firstname__icontains=name)
+                                               | Q(helper__surname__icontains=name))
+
+        presence = self.cleaned_data.get('presence')
+        if presence == self.PRESENCE_PRESENT:
+            helpershifts = helpershifts.filter(present=True)
+        elif presence == self.PRESENCE_ABSENT:
+            helpershifts = helpershifts.filter(present=False, manual_presence=True)
+        elif presence == self.PRESENCE_UNKNOWN:
+            helpershifts = helpershifts.filter(present=False, manual_presence=False)
 
-        return list(data)  # directly evaluate filter here
+        return helpershifts
 
 
 class HelperResendMailForm(forms.Form):
@@ -1,13 +1,19 @@
 from django import forms
 from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.utils.functional import cached_property
 from django.utils.html import format_html
+from django.utils.translation import get_language
 from django.utils.translation import ugettext_lazy as _
 
 from ..models import Helper, Shift
+from ..utils import find_overlapping_shifts, get_event_version
 
 from news.helper import news_add_email
 
-import itertools
+from collections import OrderedDict
+
+import hashlib
 
 
 class RegisterForm(forms.ModelForm):
@@ -36,9 +42,14 @@ class RegisterForm(forms.ModelForm):
         self.link = kwargs.pop('link', False)
 
         self.shifts = {}
+        self.shifts_by_job = {}
 
         super(RegisterForm, self).__init__(*args, **kwargs)
 
+        # only the unchanged public form is cached (no selected shifts, no errors, no internal registration).
+        # the cached fields must not depend on the number of helpers, full shifts are disabled by registration.js.
+        self.cache_shifts = not (self.is_bound or self.selected_shifts or self.internal)
+
         # remove field for phone number
         if not self.event.ask_phone:
             self.fields.pop('phone')
@@ -82,26 +93,32 @@ class RegisterForm(forms.ModelForm):
             )
             self.fields['news'] = forms.BooleanField(label=news_label, required=False)
 
-        # get a list of all shifts
+        # get a list of all shifts, this is the only query for shifts. The shifts are used for the fields,
+        # the validation and to save the helper. The queryset is evaluated here, so that the checks for
+        # `displayed_shifts` later do not cause more queries.
+        if self.displayed_shifts is not None:
+            self.displayed_shifts = self.displayed_shifts.select_related('job')
+
         if self.displayed_shifts:
             all_shifts = self.displayed_shifts
         else:
             all_shifts = Shift.objects.filter(job__event=self.event,
-                                              hidden=False)
+                                              hidden=False).select_related('job')
 
         # add fields for shifts
         for shift in all_shifts:
             id = 'shift_%s' % shift.pk
             self.fields[id] = self._make_field(shift)
 
-            # safe mapping id <-> pk
-            self.shifts[id] = shift.pk
+            # safe mapping id <-> shift
+            self.shifts[id] = shift
+            self.shifts_by_job.setdefault(shift.job_id, []).append(shift)
 
     def _make_field(self, shift):
         field = forms.BooleanField(label=shift, required=False)
 
         # disable button if shift is full
-        if shift.is_full() or (shift.blocked and not self.displayed_shifts):
+        if (shift.is_full() and not self.cache_shifts) or (shift.blocked and not self.displayed_shifts):
             field.widget.attrs['disabled'] = True
         else:
             # else set it up for automatic disabling
@@ -122,22 +139,39 @@ class RegisterForm(forms.ModelForm):
 
     def get_jobs(self):
         if self.displayed_shifts:
-            jobs = []
-
             # get all jobs, that have a shift contained in displayed_shifts
-            for job in self.event.job_set.all():
-                if job.shift_set.all() & self.displayed_shifts.all():
-                    jobs.append(job)
-            return jobs
+            jobs = {}
+            for shift in self.shifts.values():
+                jobs[shift.job_id] = shift.job
+            return sorted(jobs.values(), key=lambda j: (-j.order, j.pk))
         else:
             return self.event.public_jobs
 
     def get_shifts(self, job):
+        shifts = self.shifts_by_job.get(job.pk)
+        if not shifts:
+            return OrderedDict()
+        return job.shifts_by_day(shifts)
+
+    @cached_property
+    def shifts_cache_key(self):
+        """ Key for the cache of the rendered shifts or None, if the shifts must not be cached.
+
+        The cached shifts only contain the jobs and shifts, but not the number of helpers. So the key contains the
+        version of the jobs and shifts of the event, which does not change if helpers register.
+        """
+        if not self.cache_shifts:
+            return None
+
+        # links: the displayed shifts are part of the key
         if self.displayed_shifts:
-            shifts = self.displayed_shifts.filter(job=job)
-            return job.shifts_by_day(shifts)
+            shifts = ",".join(sorted(str(shift.pk) for shift in self.shifts.values()))
+            variant = hashlib.sha1(shifts.encode()).hexdigest()
         else:
-            return job.shifts_by_day(show_hidden=self.internal or self.link)
+            variant = "public"
+
+        version = get_event_version(self.event.pk, shifts=True)
+        return "{}-{}-{}-{}".format(self.event.pk, version, get_language(), variant)
 
     def clean(self):
         """ Custom validation of shifts and other fields.
@@ -148,7 +182,7 @@ class RegisterForm(forms.ModelForm):
             selected shifts requires this.
           * The selected shift is not full.
 
-        TODO: improve performance: get shift only once from DB
+        The shifts were loaded in `__init__` already, no further queries are necessary.
         """
         super(RegisterForm, self).clean()
 
@@ -188,7 +222,7 @@ class RegisterForm(forms.ModelForm):
         # iterate over all (selected) shifts
         for shift in selected_shifts:
             # get this shift
-            cur_shift = Shift.objects.get(pk=self.shifts[shift])
+            cur_shift = self.shifts[shift]
 
             # check if infection instruction is needed for one of the
             # shifts
@@ -211,32 +245,17 @@ class RegisterForm(forms.ModelForm):
         # check for overlapping shifts
         if self.event.max_overlapping is not None:
             max_overlap = self.event.max_overlapping
-            if self._check_has_overlap(selected_shifts, max_overlap):
+            if find_overlapping_shifts([self.shifts[shift] for shift in selected_shifts], max_overlap):
                 raise ValidationError(_("Some of your shifts overlap more then %(minutes)d minutes.") %
                                       {'minutes': max_overlap})
 
-    def _check_has_overlap(self, shifts, max_overlap):
-        """
-        Check if any two shifts from the argument list are overlapping
-        The arguments are the keys of the shifts
+    def save(self):
+        """ Save the helper and add it to the selected shifts.
 
-        :return: true of overlap exists
+        The helper and the shifts are always saved in one transaction, the places in the shifts cannot be
+        reserved without saving the helper. If one of the shifts was filled up since the validation,
+        `ShiftFull` is raised and nothing is saved.
         """
-
-        for shifts in itertools.combinations(shifts, 2):
-            s1 = Shift.objects.get(pk=self.shifts[shifts[0]])
-            s2 = Shift.objects.get(pk=self.shifts[shifts[1]])
-
-            # check if shifts overlap (1st or term) or one shift is part
-            # of the other shift (2nd and 3rd or term)
-            if ((s2.end-s1.begin).total_seconds() > max_overlap*60
-                    and (s1.end-s2.begin).total_seconds() > max_overlap*60) \
-                    or (s1.begin >= s2.begin and s1.end <= s2.end) \
-                    or (s2.begin >= s1.begin and s2.end <= s1.end):
-                return True
-        return False
-
-    def save(self, commit=True):
         instance = super(RegisterForm, self).save(False)
 
         instance.event = self.event
@@ -245,17 +264,15 @@ class RegisterForm(forms.ModelForm):
         if self.event.mail_validation:
             instance.validated = False
 
-        # must commit for m2m operations
-        instance.save()
-
-        for shift in self.shifts:
-            if self.cleaned_data.get(shift):
-                new_shift = Shift.objects.get(pk=self.shifts[shift])
-                instance.shifts.add(new_shift)
+        selected_shifts = [self.shifts[shift] for shift in self.shifts if self.cleaned_data.get(shift)]
 
-        if commit:
+        with transaction.atomic():
+            # must commit for m2m operations
             instance.save()
 
+            # blocked shifts are only possible for links and internal registrations
+            instance.add_shifts(selected_shifts, allow_blocked=bool(self.displayed_shifts))
+
         # add to news
         if self.ask_news and self.cleaned_data.get('news'):
             news_add_email(self.cleaned_data.get('email'))
@@ -0,0 +1,30 @@
+# Generated by Django 3.1.14 on 2026-10-18 20:39
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def fill_occupancy(apps, schema_editor):
+    Shift = apps.get_model('registration', 'Shift')
+    HelperShift = apps.get_model('registration', 'HelperShift')
+
+    counts = HelperShift.objects.filter(shift=OuterRef('pk')).order_by().values('shift') \
+        .annotate(num=Count('pk')).values('num')
+    Shift.objects.update(occupancy=Coalesce(Subquery(counts), 0))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('registration', '0044_eventarchive'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='shift',
+            name='occupancy',
+            field=models.IntegerField(default=0, editable=False, verbose_name='Number of registered helpers'),
+        ),
+        migrations.RunPython(fill_occupancy, reverse_code=migrations.RunPython.noop),
+    ]
@@ -6,4 +6,5 @@ from .shift import Shift
 from .helper import Helper
 from .helpershift import HelperShift
 from .link import Link
-from .duplicate import Duplicate
\ No newline at end of file
+from .duplicate import Duplicate
+from .exportartifact import ExportArtifact
@@ -1,9 +1,12 @@
 from django.contrib.auth import get_user_model
 from django.db import models
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
 from django.utils.translation import ugettext_lazy as _
 
 from multiselectfield import MultiSelectField
 
+from ..utils import invalidate_involved_events
 from .event import Event
 
 
@@ -45,3 +48,9 @@ class EventAdminRoles(models.Model):
 
     def __str__(self):
         return "{} - {} ({})".format(self.event.name, self.user, ", ".join(self.roles))
+
+
+@receiver(post_save, sender=EventAdminRoles, dispatch_uid='eventadminroles_saved')
+@receiver(post_delete, sender=EventAdminRoles, dispatch_uid='eventadminroles_deleted')
+def eventadminroles_changed(sender, instance, **kwargs):
+    invalidate_involved_events([instance.user_id])
@@ -3,7 +3,7 @@ from django.contrib.auth import get_user_model
 from django.core.exceptions import ValidationError
 from django.core.validators import MinValueValidator, RegexValidator
 from django.db import models
-from django.db.models.signals import pre_save, post_save
+from django.db.models.signals import pre_save, post_save, post_delete
 from django.dispatch import receiver
 from django.utils.translation import ugettext_lazy as _
 from django_bleach.models import BleachField
@@ -16,6 +16,9 @@ from gifts.models import HelpersGifts
 from gifts.models.giftsettings import GiftSettings
 from inventory.models import InventorySettings
 
+from ..export.cache import delete_event_exports
+from ..utils import update_event_version
+
 
 def _default_mail():
     return settings.EMAIL_SENDER_ADDRESS
@@ -419,3 +422,11 @@ def event_saved(sender, instance, using, **kwargs):
 
     if instance.inventory:
         instance._setup_inventory_settings()
+
+    update_event_version(instance.pk, shifts=True)
+
+
+@receiver(post_delete, sender=Event, dispatch_uid='event_deleted')
+def event_deleted(sender, instance, **kwargs):
+    """ Delete the cached exports, they contain personal data. """
+    delete_event_exports(instance.pk)
@@ -0,0 +1,38 @@
+from django.conf import settings
+from django.db import models
+from django.db.models.signals import post_delete
+from django.dispatch import receiver
+
+import os
+
+from helfertool.models import Artifact
+
+
+class ExportArtifact(Artifact):
+    """ A PDF or Excel file with helpers, which is generated in the background (see `tasks.export_helpers`). """
+
+    # key of `registration.export.files.FILETYPES`
+    filetype = models.CharField(
+        max_length=20,
+    )
+
+    # progress: number of exported jobs
+    progress_current = models.IntegerField(
+        null=True,
+        blank=True,
+    )
+
+    progress_total = models.IntegerField(
+        null=True,
+        blank=True,
+    )
+
+    @property
+    def path(self):
+        return os.path.join(settings.EXPORT_ARTIFACT_DIR, str(self.pk))
+
+
+@receiver(post_delete, sender=ExportArtifact, dispatch_uid='exportartifact_deleted')
+def exportartifact_deleted(sender, instance, **kwargs):
+    """ Delete the file, also if the event or user is deleted. """
+    instance.delete_file()
@@ -1,17 +1,14 @@
 from django.conf import settings
 from django.core.mail import EmailMessage
 from django.urls import reverse
-from django.db import models
-from django.db.models.signals import m2m_changed, post_save
+from django.db import connection, models, transaction
+from django.db.models import F
+from django.db.models.signals import m2m_changed, post_save, post_delete
 from django.dispatch import receiver
 from django.template.loader import get_template
+from django.utils import translation
 from django.utils.translation import ugettext_lazy as _
 
-from smtplib import SMTPException
-
-import logging
-logger = logging.getLogger("helfertool.registration")
-
 import uuid
 
 from badges.models import Badge
@@ -19,9 +16,13 @@ from gifts.models import HelpersGifts
 from mail.tracking import new_tracking_registration
 from prerequisites.models import Prerequisite
 
+from .. import tasks
+from ..exceptions import ShiftFull
+from ..utils import update_event_version
 from .event import Event
 from .job import Job
 from .helpershift import HelperShift
+from .shift import Shift
 
 
 class Helper(models.Model):
@@ -188,16 +189,31 @@ class Helper(models.Model):
         """ Send a confirmation e-mail to the registered helper.
 
         This e-mail contains a list of the shifts, the helper registered for.
+
+        The mail is sent by a Celery task, so the request does not wait for the mail server. If sending fails
+        after all retries, `mail_failed` is set.
         """
         # safety check ;)
         if self.shifts.count() == 0 and not self.is_coordinator:
             return
 
-        # generate URLs
+        # generate URLs, they are needed in the task where no request is available
         event = self.event
         validate_url = request.build_absolute_uri(reverse('validate', args=[event.url_name, self.id]))
         registered_url = request.build_absolute_uri(reverse('registered', args=[event.url_name, self.id]))
 
+        # queue the mail only after the helper is committed, otherwise the worker may not find it
+        language = translation.get_language()
+        transaction.on_commit(lambda: tasks.send_registration_mail.delay(str(self.pk), internal, validate_url,
+                                                                         registered_url, language))
+
+    def get_mail(self, internal, validate_url, registered_url):
+        """ Returns the confirmation e-mail as `EmailMessage` (see `send_mail`).
+
+        The texts are rendered in the currently active language.
+        """
+        event = self.event
+
         # generate subject and text from templates
         subject_template = get_template('registration/mail/subject.txt')
         subject = subject_template.render({'event': event}).rstrip()
@@ -216,28 +232,52 @@ class Helper(models.Model):
         # header for mail tracking
         tracking_header = new_tracking_registration(self)
 
-        # sent it and handle errors
-        mail = EmailMessage(subject,
+        return EmailMessage(subject,
                             text,
                             settings.EMAIL_SENDER_ADDRESS,
                             [self.email, ],  # to
                             reply_to=[event.email, ],
                             headers=tracking_header)
 
-        try:
-            mail.send(fail_silently=False)
-            return True
-        except (SMTPException, ConnectionError) as e:
-            self.mail_failed = "Local server error"
-            self.save()
+    def add_shifts(self, shifts, allow_blocked=True):
+        """ Add the helper to the given shifts, but only if all of them have free places.
 
-            logger.error("helper mailerror", extra={
-                'event': event,
-                'helper': self,
-                'error': str(e),
-            })
+        The places in all shifts are reserved with one conditional update (number of helpers below the maximum),
+        so concurrent registrations cannot overbook a shift. If one of the shifts is full (or blocked and
+        `allow_blocked` is False), `ShiftFull` is raised and nothing is changed.
 
-            return False
+        Databases with row locks (PostgreSQL, MySQL) lock the shifts with SELECT FOR UPDATE in a fixed order first,
+        otherwise concurrent updates of the same shifts could deadlock. SQLite does not support this, the update
+        is the first statement of the transaction there, so it waits for the write lock instead of failing when
+        it upgrades a read lock.
+
+        The helper must not be registered for the shifts already.
+        """
+        shifts = sorted(shifts, key=lambda s: s.pk)
+        pks = [shift.pk for shift in shifts]
+
+        with transaction.atomic():
+            if connection.features.has_select_for_update:
+                list(Shift.objects.select_for_update().filter(pk__in=pks).order_by('pk').values_list('pk'))
+
+            reservation = Shift.objects.filter(pk__in=pks, occupancy__lt=F('number'))
+            if not allow_blocked:
+                reservation = reservation.filter(blocked=False)
+
+            sid = transaction.savepoint()
+            if reservation.update(occupancy=F('occupancy') + 1) != len(pks):
+                # undo the reservations, then the current state shows which shift is full
+                transaction.savepoint_rollback(sid)
+                full_shifts = Shift.objects.filter(pk__in=pks, occupancy__gte=F('number'))
+                if not allow_blocked:
+                    full_shifts |= Shift.objects.filter(pk__in=pks, blocked=True)
+                raise ShiftFull(full_shifts.order_by('pk').first() or shifts[0])
+            transaction.savepoint_commit(sid)
+
+            # bulk_create does not send signals, so the occupancy is not increased twice
+            HelperShift.objects.bulk_create([HelperShift(helper=self, shift=shift) for shift in shifts])
+
+            update_event_version(self.event_id)
 
     def check_delete(self):
         if self.shifts.count() == 0 and not self.is_coordinator:
@@ -300,6 +340,14 @@ def helper_saved(sender, instance, using, **kwargs):
             gifts.helper = instance
             gifts.save()
 
+        # personal data is part of exports
+        update_event_version(instance.event_id)
+
+
+@receiver(post_delete, sender=Helper, dispatch_uid='helper_post_delete')
+def helper_post_delete(sender, instance, **kwargs):
+    update_event_version(instance.event_id)
+
 
 def helper_deleted(sender, **kwargs):
     action = kwargs.pop('action')
@@ -309,6 +357,31 @@ def helper_deleted(sender, **kwargs):
         helper.check_delete()
 
 
+def helper_shifts_changed(sender, **kwargs):
+    """ Increase the occupancy of shifts after `helper.shifts.add()` or `shift.helper_set.add()` and update the
+    data version of the event after all changes.
+
+    `pk_set` only contains the newly added objects. The occupancy of removed relations is handled by the
+    `post_delete` handler of `HelperShift`.
+    """
+    action = kwargs.pop('action')
+
+    if action in ("post_add", "post_remove", "post_clear"):
+        instance = kwargs.pop('instance')
+        pk_set = kwargs.pop('pk_set')
+
+        if kwargs.pop('reverse'):
+            # instance is a shift, pk_set contains helpers
+            if action == "post_add":
+                Shift.objects.filter(pk=instance.pk).update(occupancy=F('occupancy') + len(pk_set))
+            update_event_version(instance.job.event_id)
+        else:
+            # instance is a helper, pk_set contains shifts
+            if action == "post_add":
+                Shift.objects.filter(pk__in=pk_set).update(occupancy=F('occupancy') + 1)
+            update_event_version(instance.event_id)
+
+
 def coordinator_deleted(sender, **kwargs):
     action = kwargs.pop('action')
 
@@ -322,5 +395,17 @@ def coordinator_deleted(sender, **kwargs):
             helper.check_delete()
 
 
+def coordinators_changed(sender, **kwargs):
+    """ Update the data version of the event if coordinators are added or removed (they are part of exports). """
+    action = kwargs.pop('action')
+
+    if action in ("post_add", "post_remove", "post_clear"):
+        # instance is a job or a helper, both have the event
+        instance = kwargs.pop('instance')
+        update_event_version(instance.event_id)
+
+
 m2m_changed.connect(helper_deleted, sender=Helper.shifts.through)
+m2m_changed.connect(helper_shifts_changed, sender=Helper.shifts.through)
 m2m_changed.connect(coordinator_deleted, sender=Job.coordinators.through)
+m2m_changed.connect(coordinators_changed, sender=Job.coordinators.through)
@@ -1,6 +1,12 @@
 from django.db import models
+from django.db.models import F
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
 from django.utils.translation import ugettext_lazy as _
 
+from ..utils import update_event_version
+from .shift import Shift
+
 
 class HelperShift(models.Model):
     """
@@ -51,3 +57,27 @@ class HelperShift(models.Model):
 
     def __str__(self):
         return "{} - {} - {}".format(self.helper.event, self.helper, self.shift)
+
+
+@receiver(post_save, sender=HelperShift, dispatch_uid='helpershift_saved')
+def helpershift_saved(sender, instance, created, raw, **kwargs):
+    """ Increase the occupancy of the shift if a HelperShift is created directly.
+
+    `helper.shifts.add()` uses `bulk_create`, which does not send this signal. This case is handled by the
+    `m2m_changed` handler in `helper.py`.
+    """
+    if created and not raw:
+        Shift.objects.filter(pk=instance.shift_id).update(occupancy=F('occupancy') + 1)
+        update_event_version(instance.helper.event_id)
+
+
+@receiver(post_delete, sender=HelperShift, dispatch_uid='helpershift_deleted')
+def helpershift_deleted(sender, instance, **kwargs):
+    """ Decrease the occupancy of the shift if a HelperShift is deleted.
+
+    This covers `helper.shifts.remove()`, `clear()` and the deletion of helpers (cascade).
+
+    The data version of the event is not changed here, this would need a query for every deleted row. It is
+    changed by the `m2m_changed` handler in `helper.py` and the `post_delete` handlers of helpers and shifts.
+    """
+    Shift.objects.filter(pk=instance.shift_id).update(occupancy=F('occupancy') - 1)
@@ -1,6 +1,6 @@
 from django.contrib.auth import get_user_model
 from django.db import models
-from django.db.models.signals import pre_save
+from django.db.models.signals import m2m_changed, pre_save, pre_delete, post_save, post_delete
 from django.dispatch import receiver
 from django.utils.translation import ugettext_lazy as _
 from django_bleach.models import BleachField
@@ -11,6 +11,8 @@ from copy import deepcopy
 from badges.models import BadgeDefaults
 from prerequisites.models import Prerequisite
 
+from ..utils import invalidate_involved_events, update_event_version
+
 
 class Job(models.Model):
     """ A job that contains min. 1 shift.
@@ -189,5 +191,40 @@ def job_pre_save(sender, instance, using, **kwargs):
         instance.badge_defaults = defaults
 
 
+@receiver(post_save, sender=Job, dispatch_uid='job_saved')
+@receiver(post_delete, sender=Job, dispatch_uid='job_deleted')
+def job_changed(sender, instance, **kwargs):
+    update_event_version(instance.event_id, shifts=True)
+
+
+@receiver(pre_delete, sender=Job, dispatch_uid='job_pre_delete')
+def job_pre_delete(sender, instance, **kwargs):
+    """ The job admins lose their access when the job is deleted.
+
+    The relations to the job admins are deleted without `m2m_changed` signal, so the involved events of the
+    job admins are invalidated here.
+    """
+    invalidate_involved_events(instance.job_admins.values_list('pk', flat=True))
+
+
+def job_admins_changed(sender, **kwargs):
+    """ Invalidate the involved events of the users that were added to or removed from the job admins. """
+    action = kwargs.pop('action')
+    instance = kwargs.pop('instance')
+
+    if kwargs.pop('reverse'):
+        # user.job_set.add() / remove() / clear()
+        if action in ('post_add', 'post_remove', 'post_clear'):
+            invalidate_involved_events([instance.pk])
+    else:
+        if action in ('post_add', 'post_remove'):
+            invalidate_involved_events(kwargs.pop('pk_set'))
+        elif action == 'pre_clear':
+            invalidate_involved_events(instance.job_admins.values_list('pk', flat=True))
+
+
+m2m_changed.connect(job_admins_changed, sender=Job.job_admins.through)
+
+
 # moving the import down here fixes a problem with a circular import
 from .helper import Helper
@@ -1,6 +1,6 @@
 from django.core.validators import MinValueValidator
 from django.db import models
-from django.db.models.signals import pre_delete
+from django.db.models.signals import pre_delete, post_save, post_delete
 from django.dispatch import receiver
 from django.template.defaultfilters import date as date_f
 from django.utils.timezone import localtime
@@ -12,6 +12,8 @@ from datetime import datetime
 
 import math
 
+from ..utils import update_event_version
+
 
 class Shift(models.Model):
     """ A shift of one job.
@@ -24,6 +26,9 @@ class Shift(models.Model):
         :blocked: shift is blocked, if the job is public
         :hidden: shift is not displayed publicly
         :name: name of the shift (optional)
+        :archived_number: number of helpers, only used for archived events
+        :occupancy: current number of helpers, maintained by the signal
+                    handlers of `HelperShift`
     """
     class Meta:
         ordering = ['job', 'begin', 'end']
@@ -75,6 +80,12 @@ class Shift(models.Model):
         verbose_name=_("Number of registered helpers for archived event"),
     )
 
+    occupancy = models.IntegerField(
+        default=0,
+        editable=False,
+        verbose_name=_("Number of registered helpers"),
+    )
+
     def __str__(self):
         if self.name:
             return "%s, %s, %s" % (self.job.name, self.name,
@@ -82,6 +93,16 @@ class Shift(models.Model):
         else:
             return "%s, %s" % (self.job.name, self.time_with_day())
 
+    def save(self, *args, **kwargs):
+        # the occupancy is only changed by atomic updates in the database (see `HelperShift`),
+        # so the maybe outdated value of this instance must not overwrite it
+        if self.pk and not self._state.adding and kwargs.get('update_fields') is None \
+                and not kwargs.get('force_insert'):
+            kwargs['update_fields'] = [f.name for f in self._meta.concrete_fields
+                                       if not f.primary_key and f.name != 'occupancy']
+
+        super(Shift, self).save(*args, **kwargs)
+
     def time(self):
         """ Returns a string representation of the begin and end time.
 
@@ -115,14 +136,14 @@ class Shift(models.Model):
         """
         Returns the current number of helpers, but 0 if event is archived.
         """
-        return self.helper_set.count()
+        return self.occupancy
 
     def num_helpers_archived(self):
         """ Returns the current number of helpers- """
         if self.job.event.archived:
             return self.archived_number
         else:
-            return self.helper_set.count()
+            return self.occupancy
 
     def is_full(self):
         """ Check if the shift is full and return a boolean. """
@@ -181,6 +202,7 @@ class Shift(models.Model):
         new_shift = deepcopy(self)
         new_shift.pk = None
         new_shift.archived_number = 0
+        new_shift.occupancy = 0
 
         # maybe shift is copied to new job
         if new_job:
@@ -232,3 +254,9 @@ def shift_deleted(sender, instance, using, **kwargs):
     # m2m_changed does not trigger here, so remote the helpers before the shift is deleted
     for helper in instance.helper_set.all():
         helper.shifts.remove(instance)
+
+
+@receiver(post_save, sender=Shift, dispatch_uid='shift_saved')
+@receiver(post_delete, sender=Shift, dispatch_uid='shift_deleted')
+def shift_changed(sender, instance, **kwargs):
+    update_event_version(instance.job.event_id, shifts=True)
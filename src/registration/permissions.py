@@ -1,4 +1,8 @@
+from django.core.cache import caches
+from django.db.models import Q
+
 from .models import Event, EventAdminRoles, Job, Helper
+from .utils import involved_events_cache_key
 
 # This is the central file that defines and manages the different permissions for events, jobs and users.
 # Global permissions like creating events, users or sending newsletters are managed in the accounts app.
@@ -237,6 +241,69 @@ _rbac_matrix = {
 }
 
 
+class _EventPermissions:
+    """
+    Snapshot of the permissions of one user for one event: the admin roles and the jobs, where the user is job admin.
+    """
+    def __init__(self, user, event_pk):
+        self._helper_job_pks = {}
+
+        if user.pk is None:
+            self.roles = []
+            self.admin_job_pks = frozenset()
+            return
+
+        self.roles = []
+        for roles in EventAdminRoles.objects.filter(event_id=event_pk, user=user).values_list('roles', flat=True):
+            self.roles.extend(roles)
+
+        self.admin_job_pks = frozenset(Job.objects.filter(event_id=event_pk, job_admins=user)
+                                       .values_list('pk', flat=True))
+
+    def helper_job_pks(self, helper):
+        """
+        Returns the primary keys of the jobs, that the helper is registered for or coordinates.
+        """
+        try:
+            return self._helper_job_pks[helper.pk]
+        except KeyError:
+            pks = frozenset(Job.objects.filter(Q(shift__helper=helper) | Q(coordinators=helper))
+                            .values_list('pk', flat=True).distinct())
+            self._helper_job_pks[helper.pk] = pks
+            return pks
+
+
+def _get_event_permissions(user, event_pk):
+    """
+    Returns the `_EventPermissions` of the user for the event.
+
+    The snapshot is cached on the user object, so it is loaded only once per request (the user object is created
+    for every request by the AuthenticationMiddleware). Use `clear_permission_cache` if the permissions of the user
+    were changed and are checked again using the same user object.
+    """
+    try:
+        cache = user._helfertool_permissions
+    except AttributeError:
+        cache = user._helfertool_permissions = {}
+
+    try:
+        return cache[event_pk]
+    except KeyError:
+        permissions = _EventPermissions(user, event_pk)
+        cache[event_pk] = permissions
+        return permissions
+
+
+def clear_permission_cache(user):
+    """
+    Drop the cached permissions of the user object (see `_get_event_permissions`).
+    """
+    try:
+        del user._helfertool_permissions
+    except AttributeError:
+        pass
+
+
 def has_access(user, resource, access):
     """
     Checks whether the user has access to the resource with the requested access type.
@@ -272,24 +339,93 @@ def has_access_event_or_job(user, event, access_event, access_job):
         return True
 
     # check jobs
-    for job in event.job_set.all():
-        if has_access(user, job, access_job):
-            return True
+    if not user.is_authenticated:
+        return False
 
-    return False
+    if user.is_superuser:
+        return event.job_set.exists()
+
+    # job admin of one job is enough, no need to iterate over all jobs
+    if _get_event_permissions(user, event.pk).admin_job_pks:
+        return True
+
+    return _check_event_role(user, event.pk, access_job) and event.job_set.exists()
+
+
+def involved_event_pks(user):
+    """
+    Returns the primary keys of all events, where the user has the access `ACCESS_INVOLVED`.
+
+    This is the same check as `has_access` for each event, but done with two queries. The result is cached per user
+    in the `registration` cache and invalidated when the admin roles or job admins change.
+    """
+    # No user, no permissions
+    if not user.is_authenticated:
+        return frozenset()
+
+    # superuser can do anything
+    if user.is_superuser:
+        return frozenset(Event.objects.values_list('pk', flat=True))
+
+    cache = caches['registration']
+    key = involved_events_cache_key(user.pk)
+    event_pks = cache.get(key)
+
+    if event_pks is None:
+        # events with roles
+        required_roles = _rbac_matrix[ACCESS_INVOLVED]
+        event_pks = set()
+        for event_pk, roles in EventAdminRoles.objects.filter(user=user).values_list('event_id', 'roles'):
+            if any(role in required_roles for role in roles):
+                event_pks.add(event_pk)
+
+        # events with job admins
+        event_pks.update(Job.objects.filter(job_admins=user).values_list('event_id', flat=True))
+
+        event_pks = frozenset(event_pks)
+        cache.set(key, event_pks)
+
+    return event_pks
+
+
+def filter_helpers_with_access(user, event, helpers, access):
+    """
+    Returns the helpers of the queryset `helpers` (all of them belong to `event`) that the user can access
+    with the requested access type.
+
+    This is the same check as `has_access` for each helper, but done as a single filter in the database.
+    """
+    # No user, no permissions
+    if not user.is_authenticated:
+        return helpers.none()
+
+    # superuser can do anything
+    if user.is_superuser:
+        return helpers
+
+    # role for the whole event
+    if _check_event_role(user, event.pk, access):
+        return helpers
+
+    # job admins: helpers of the shifts or coordinators of the jobs
+    admin_job_pks = _get_event_permissions(user, event.pk).admin_job_pks
+    if not admin_job_pks:
+        return helpers.none()
+
+    accessible_helpers = Helper.objects.filter(Q(shifts__job__in=admin_job_pks) | Q(job__in=admin_job_pks))
+    return helpers.filter(pk__in=accessible_helpers.values('pk'))
 
 
 def _has_access_event(user, event, access):
     # check role
-    if _check_event_role(user, event, access):
+    if _check_event_role(user, event.pk, access):
         return True
 
     # special cases
     if access == ACCESS_INVOLVED:
         # involved: also check jobs
-        for job in event.job_set.all():
-            if _check_job_role(user, job, access):
-                return True
+        if _get_event_permissions(user, event.pk).admin_job_pks:
+            return True
 
     # nothing worked, no access
     return False
@@ -297,7 +433,7 @@ def _has_access_event(user, event, access):
 
 def _has_access_job(user, job, access):
     # check role
-    if _check_event_role(user, job.event, access):
+    if _check_event_role(user, job.event_id, access):
         return True
 
     # handle job admins
@@ -309,30 +445,25 @@ def _has_access_job(user, job, access):
 
 def _has_access_helper(user, helper, access):
     # check role
-    if _check_event_role(user, helper.event, access):
+    if _check_event_role(user, helper.event_id, access):
         return True
 
-    # handle job admins for helpers
-    for shift in helper.shifts.all():
-        if _check_job_role(user, shift.job, access):
-            return True
-
-    # handle job admins for coordinators
-    for job in helper.job_set.all():
-        if _check_job_role(user, job, access):
-            return True
+    # handle job admins for helpers and coordinators
+    # (only query the jobs of the helper if the user is job admin at all)
+    permissions = _get_event_permissions(user, helper.event_id)
+    if not permissions.admin_job_pks:
+        return False
 
-    return False
+    return not permissions.admin_job_pks.isdisjoint(permissions.helper_job_pks(helper))
 
 
-def _check_event_role(user, event, access):
+def _check_event_role(user, event_pk, access):
     """
     Check whether the user has a required role for this access
     """
     # get admin roles of user
-    try:
-        admin_roles = EventAdminRoles.objects.get(event=event, user=user).roles
-    except EventAdminRoles.DoesNotExist:
+    admin_roles = _get_event_permissions(user, event_pk).roles
+    if not admin_roles:
         return False
 
     # get required roles for this access type
@@ -351,4 +482,4 @@ def _check_event_role(user, event, access):
 
 def _check_job_role(user, job, access):
     # user is job admin or not, nothing more
-    return job.job_admins.filter(pk=user.pk).exists()
+    return job.pk in _get_event_permissions(user, job.event_id).admin_job_pks
@@ -1,9 +1,24 @@
 from __future__ import absolute_import
 
+from celery import shared_task
 from celery.signals import worker_ready
 
+from django.conf import settings
+from django.core.mail import EmailMessage
+from django.utils import translation
+from django.utils.dateparse import parse_date
+
+from smtplib import SMTPException, SMTPRecipientsRefused
+
+import logging
+logger = logging.getLogger("helfertool.registration")
+
+import os
+
 from helfertool.utils import cache_lock
-from .models import Event
+import registration
+import registration.export.cache
+import registration.export.files
 
 
 @worker_ready.connect  # run on worker startup (when worker is ready to accept tasks)
@@ -11,7 +26,105 @@ def setup_event_flags(sender=None, headers=None, body=None, **kwargs):
     with cache_lock("setup_event_flags", sender.app.oid) as acquired:
         if acquired:
             # iterate over all events
-            for event in Event.objects.all():
+            for event in registration.models.Event.objects.all():
                 if event._setup_flags():
                     # True returned means changed -> save changes
                     event.save()
+
+
+@shared_task(bind=True, max_retries=5)
+def send_registration_mail(self, helper_pk, internal, validate_url, registered_url, language, message=None):
+    """ Send the confirmation mail to a helper (see `Helper.send_mail`).
+
+    Temporary errors of the mail server are retried with an increasing delay, if the recipient is refused or
+    all retries failed, `mail_failed` is set for the helper. The mail is built only once, the retries get it
+    as `message`.
+    """
+    try:
+        helper = registration.models.Helper.objects.get(pk=helper_pk)
+    except registration.models.Helper.DoesNotExist:
+        # helper was deleted in the meantime
+        return
+
+    if message is None:
+        prev_language = translation.get_language()
+        translation.activate(language)
+        try:
+            mail = helper.get_mail(internal, validate_url, registered_url)
+        finally:
+            translation.activate(prev_language)
+    else:
+        mail = EmailMessage(**message)
+
+    try:
+        mail.send(fail_silently=False)
+    except (SMTPException, OSError) as e:
+        # OSError also covers refused connections and timeouts of the mail server
+        if not isinstance(e, SMTPRecipientsRefused) and self.request.retries < self.max_retries:
+            message = {
+                'subject': mail.subject,
+                'body': mail.body,
+                'from_email': mail.from_email,
+                'to': mail.to,
+                'reply_to': mail.reply_to,
+                'headers': mail.extra_headers,
+            }
+            raise self.retry(exc=e, countdown=60 * 2 ** self.request.retries, kwargs={'message': message})
+
+        # only update this field, the helper may have been changed in the meantime
+        registration.models.Helper.objects.filter(pk=helper.pk).update(mail_failed="Local server error")
+
+        logger.error("helper mailerror", extra={
+            'event': helper.event,
+            'helper': helper,
+            'error': str(e),
+        })
+
+
+@shared_task
+def export_helpers(artifact_pk, job_pk, date_str, language, cache_key=None):
+    """ Export the helpers as PDF or Excel file for the `ExportArtifact` in the background and store it in
+    `EXPORT_ARTIFACT_DIR` (see `registration.views.export`).
+
+    The progress is stored in the artifact as number of exported jobs. If `cache_key` is set, the finished file
+    is also added to the export cache.
+    """
+    try:
+        artifact = registration.models.ExportArtifact.objects.select_related('event').get(pk=artifact_pk)
+    except registration.models.ExportArtifact.DoesNotExist:
+        # artifact was deleted in the meantime
+        return
+    event = artifact.event
+    job = registration.models.Job.objects.filter(pk=job_pk).first() if job_pk else None
+    date = parse_date(date_str) if date_str else None
+
+    def progress(current, total):
+        registration.models.ExportArtifact.objects.filter(pk=artifact.pk) \
+            .update(progress_current=current, progress_total=total)
+
+    # set language
+    prev_language = translation.get_language()
+    translation.activate(language)
+
+    try:
+        jobs, filename = registration.export.files.get_export_jobs(event, job, date)
+
+        os.makedirs(settings.EXPORT_ARTIFACT_DIR, exist_ok=True)
+        with open(artifact.path, 'wb') as f:
+            registration.export.files.write_export(f, artifact.filetype, event, jobs, date, progress)
+    except Exception:
+        # the admins get a mail with the exception (see helfertool.celery)
+        artifact.fail()
+        artifact.delete_file()
+        raise
+    finally:
+        translation.activate(prev_language)
+
+    if artifact.finish(filename, settings.EXPORT_FILE_TIMEOUT) and cache_key:
+        registration.export.cache.store_export_file(cache_key, artifact.path)
+
+
+@shared_task
+def cleanup_export_cache():
+    """ Deletes the old files of the export cache (periodic task). """
+    registration.export.cache.cleanup()
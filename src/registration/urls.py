@@ -32,6 +32,10 @@ urlpatterns = [
         views.form,
         name='form'),
 
+    url(r'^(?P<event_url_name>[a-zA-Z0-9]+)/availability/$',
+        views.availability,
+        name='availability'),
+
     url(r'^(?P<event_url_name>[a-zA-Z0-9]+)/registered/'
         r'(?P<helper_id>[a-z0-9\-]+)/$',
         views.registered,
@@ -146,6 +150,11 @@ urlpatterns = [
         views.helpers_for_job,
         name='helpers_for_job'),
 
+    url(r'^(?P<event_url_name>[a-zA-Z0-9]+)/helpers/job/(?P<job_pk>[0-9]+)/'
+        r'(?P<date_str>\d{4}-\d{2}-\d{2})/$',
+        views.helpers_for_job_day,
+        name='helpers_for_job_day'),
+
     url(r'^(?P<event_url_name>[a-zA-Z0-9]+)/helpers/search/$',
         views.search_helper,
         name='search_helper'),
@@ -221,11 +230,24 @@ urlpatterns = [
         views.export,
         name='export_job_date'),
 
+    url(r'^(?P<event_url_name>[a-zA-Z0-9]+)/export/tasks/$',
+        views.export_tasklist,
+        name='export_tasklist'),
+
+    url(r'^(?P<event_url_name>[a-zA-Z0-9]+)/export/download/'
+        r'(?P<artifact_pk>[0-9a-f\-]+)/$',
+        views.export_download,
+        name='export_download'),
+
     # vacant shifts
     url(r'^(?P<event_url_name>[a-zA-Z0-9]+)/vacant/$',
         views.vacant_shifts,
         name='vacant_shifts'),
 
+    url(r'^(?P<event_url_name>[a-zA-Z0-9]+)/vacant/json/$',
+        views.vacant_shifts_json,
+        name='vacant_shifts_json'),
+
     # summaries
     url(r'^(?P<event_url_name>[a-zA-Z0-9]+)/coordinators/$',
         views.coordinators,
@@ -262,4 +284,8 @@ urlpatterns = [
     url(r'^(?P<event_url_name>[a-zA-Z0-9]+)/l/(?P<link_pk>[0-9a-f\-]+)/$',
         views.form,
         name='form_for_link'),
+
+    url(r'^(?P<event_url_name>[a-zA-Z0-9]+)/l/(?P<link_pk>[0-9a-f\-]+)/availability/$',
+        views.availability,
+        name='availability_for_link'),
 ]
@@ -1,7 +1,97 @@
+from django.core.cache import caches
+from django.db import transaction
+
 import string
+import uuid
 
 
 def escape_filename(filename):
     """Escape a filename so it includes only valid characters."""
     valid = "-_.() %s%s" % (string.ascii_letters, string.digits)
     return ''.join(char for char in filename if char in valid)
+
+
+def _event_version_key(event_pk, shifts=False):
+    if shifts:
+        return "event_shifts_version_{}".format(event_pk)
+    return "event_version_{}".format(event_pk)
+
+
+def get_event_version(event_pk, shifts=False):
+    """ Returns the current data version of an event.
+
+    The version is a random string that changes whenever the event, a job, a shift, a helper or the
+    registrations and coordinators change. It is stored in the `registration` cache, so all workers use the same
+    version. If the version is evicted from the cache, a new one is generated, which only invalidates cached data.
+
+    If `shifts` is set, the version of the jobs and shifts is returned instead. It only changes if the event, a job
+    or a shift is changed, but not if helpers register.
+    """
+    return caches['registration'].get_or_set(_event_version_key(event_pk, shifts), lambda: uuid.uuid4().hex, None)
+
+
+def update_event_version(event_pk, shifts=False):
+    """ Change the data version of an event (see `get_event_version`).
+
+    If `shifts` is set, the version of the jobs and shifts is changed, too.
+
+    The new version is set after the current transaction is committed. Otherwise, another request could
+    read the new version and the old data and cache it.
+    """
+    def _update():
+        versions = {_event_version_key(event_pk): uuid.uuid4().hex}
+        if shifts:
+            versions[_event_version_key(event_pk, True)] = uuid.uuid4().hex
+        caches['registration'].set_many(versions, None)
+
+    if event_pk is not None:
+        transaction.on_commit(_update)
+
+
+def shifts_overlap(shift1, shift2, max_overlap):
+    """ Check if two shifts overlap more than `max_overlap` minutes.
+
+    Two shifts also overlap if one shift is part of the other shift. This is the same logic as in
+    registration.js, so the frontend and backend reject the same shifts.
+    """
+    return ((shift2.end - shift1.begin).total_seconds() > max_overlap * 60
+            and (shift1.end - shift2.begin).total_seconds() > max_overlap * 60) \
+        or (shift1.begin >= shift2.begin and shift1.end <= shift2.end) \
+        or (shift2.begin >= shift1.begin and shift2.end <= shift1.end)
+
+
+def find_overlapping_shifts(shifts, max_overlap):
+    """ Find two shifts that overlap more than `max_overlap` minutes (see `shifts_overlap`).
+
+    The shifts are sorted by begin (and by descending end for the same begin). Then it is sufficient to
+    compare each shift with the previous shift that ends last, so this needs O(n log n) instead of
+    comparing all pairs.
+
+    :return: tuple of two overlapping shifts or None
+    """
+    shifts = sorted(sorted(shifts, key=lambda s: s.end, reverse=True), key=lambda s: s.begin)
+
+    latest_end = None
+    for shift in shifts:
+        if latest_end is not None and shifts_overlap(latest_end, shift, max_overlap):
+            return latest_end, shift
+
+        if latest_end is None or shift.end > latest_end.end:
+            latest_end = shift
+
+    return None
+
+
+def involved_events_cache_key(user_pk):
+    return "involved_events_{}".format(user_pk)
+
+
+def invalidate_involved_events(user_pks):
+    """ Drop the cached involved events of the users (see `registration.permissions.involved_event_pks`).
+
+    Like `update_event_version`, this is done after the current transaction is committed.
+    """
+    keys = [involved_events_cache_key(pk) for pk in user_pks if pk is not None]
+
+    if keys:
+        transaction.on_commit(lambda: caches['registration'].delete_many(keys))
@@ -1,4 +1,4 @@
-from .registration import index_all_events, index, form, registered, validate, \
+from .registration import index_all_events, index, form, availability, registered, validate, \
     deregister, deleted, update_personal
 
 from .admin import admin, manage_event, jobs_and_shifts, coordinators
@@ -6,10 +6,10 @@ from .event import edit_event, edit_event_admins, delete_event, archive_event, d
     move_event, past_events
 from .job import edit_job, delete_job, duplicate_job, duplicate_job_day, sort_job
 from .shift import edit_shift, delete_shift
-from .helper import helpers, helpers_for_job, add_helper, edit_helper, delete_helper, \
+from .helper import helpers, helpers_for_job, helpers_for_job_day, add_helper, edit_helper, delete_helper, \
     add_coordinator, delete_coordinator, add_helper_to_shift, \
     add_helper_as_coordinator, search_helper, view_helper, resend_mail
 from .link import links, edit_link, delete_link
-from .export import export
+from .export import export, export_tasklist, export_download
 from .duplicates import duplicates, merge
-from .vacant import vacant_shifts
\ No newline at end of file
+from .vacant import vacant_shifts, vacant_shifts_json
\ No newline at end of file
@@ -19,7 +19,7 @@ from ..decorators import archived_not_available
 from ..forms import EventForm, EventAdminRolesForm, EventAdminRolesAddForm, EventDeleteForm, EventArchiveForm, \
     EventDuplicateForm, EventMoveForm, PastEventForm
 from ..models import Event, EventAdminRoles
-from ..permissions import has_access, ACCESS_EVENT_EDIT
+from ..permissions import has_access, clear_permission_cache, ACCESS_EVENT_EDIT
 
 
 @login_required
@@ -121,6 +121,9 @@ def edit_event_admins(request, event_url_name=None):
                 })
                 form.instance.delete()
 
+        # the roles of the current user may have changed, the page is rendered with the new permissions
+        clear_permission_cache(request.user)
+
         # and save the form for a new admin
         if add_form.is_valid():
             new_admin = add_form.save()
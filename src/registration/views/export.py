@@ -1,28 +1,51 @@
+from django.conf import settings
 from django.contrib.auth.decorators import login_required
-from django.http import HttpResponse, Http404
-from django.shortcuts import get_object_or_404
+from django.db import transaction
+from django.http import FileResponse, Http404, HttpResponseRedirect, StreamingHttpResponse
+from django.shortcuts import get_object_or_404, render
+from django.urls import reverse
+from django.utils import timezone, translation
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date, quote_etag
 from django.utils.dateparse import parse_date
+from django.utils.translation import ugettext as _
 
 import logging
 logger = logging.getLogger("helfertool.registration")
 
-from io import BytesIO
+import os
 
 from .utils import nopermission
 
-from ..models import Event, Job, Shift
-from ..utils import escape_filename
-from ..export.excel import xlsx
-from ..export.pdf import pdf
+from .. import tasks
+from ..models import Event, ExportArtifact, Job, HelperShift, Shift
+from ..export.cache import get_export_cache_key, get_cached_export, store_export
+from ..export.files import get_export_jobs, write_export, FILETYPES
+from ..export.stream import export_stream, STREAM_FILETYPES
 from ..decorators import archived_not_available
 from ..permissions import has_access, ACCESS_EVENT_EXPORT_HELPERS
 
 
+def _export_response(request, path, cache_key, filename, content_type):
+    """ Send a cached export, but only if the client does not have the current version already. """
+    last_modified = int(os.path.getmtime(path))
+    etag = quote_etag(cache_key)
+
+    response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if response is None:
+        response = FileResponse(open(path, 'rb'), as_attachment=True, filename=filename, content_type=content_type)
+
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(last_modified)
+    patch_cache_control(response, private=True, no_cache=True)
+    return response
+
+
 @login_required
 @archived_not_available
 def export(request, event_url_name, filetype, job_pk=None, date_str=None):
     # check for valid export type
-    if filetype not in ["excel", "pdf"]:
+    if filetype not in FILETYPES and filetype not in STREAM_FILETYPES:
         raise Http404
 
     # get event
@@ -35,19 +58,13 @@ def export(request, event_url_name, filetype, job_pk=None, date_str=None):
         # check permission
         if not has_access(request.user, job, ACCESS_EVENT_EXPORT_HELPERS):
             return nopermission(request)
-
-        jobs = [job, ]
-        job_for_log = job
-        filename = "%s - %s" % (event.name, job.name)
     else:
+        job = None
+
         # check permission
         if not has_access(request.user, event, ACCESS_EVENT_EXPORT_HELPERS):
             return nopermission(request)
 
-        jobs = event.job_set.all()
-        job_for_log = None
-        filename = event.name
-
     # parse date
     date = None
     if date_str:
@@ -57,50 +74,102 @@ def export(request, event_url_name, filetype, job_pk=None, date_str=None):
             raise Http404
 
         # check if there are any shifts with this start date
-        if not Shift.objects.filter(job__in=jobs, begin__date=date).exists():
+        if job:
+            shifts = Shift.objects.filter(job=job, begin__date=date)
+        else:
+            shifts = Shift.objects.filter(job__event=event, begin__date=date)
+        if not shifts.exists():
             raise Http404
 
-        # if all jobs are shown, exclude all jobs without shifts on this day
-        if not job_pk:
-            jobs = jobs.filter(shift__begin__date=date).distinct()
-
-        filename = "{} - {}_{:02d}_{:02d}".format(filename, date.year,
-                                                  date.month, date.day)
-
-    # escape filename
-    filename = escape_filename(filename)
-
-    # create buffer
-    buffer = BytesIO()
-
-    # do filetype specific stuff
-    if filetype == 'excel':
-        filename = "%s.xlsx" % filename
-        content_type = "application/vnd.openxmlformats-officedocument" \
-                       ".spreadsheetml.sheet"
-        xlsx(buffer, event, jobs, date)
-    elif filetype == 'pdf':
-        filename = "%s.pdf" % filename
-        content_type = 'application/pdf'
-        pdf(buffer, event, jobs, date)
+    jobs, filename = get_export_jobs(event, job, date)
 
     # log
     logger.info("export", extra={
         'user': request.user,
         'event': event,
-        'job': job_for_log,
+        'job': job,
         'type': filetype,
         'file': filename,
         'date': date_str,
     })
 
-    # start http response
-    response = HttpResponse(content_type=content_type)
-    response['Content-Disposition'] = 'attachment; filename="%s"' % filename
+    # csv and json lines are streamed, they are generated row by row while sending
+    if filetype in STREAM_FILETYPES:
+        extension, content_type = STREAM_FILETYPES[filetype]
+        response = StreamingHttpResponse(export_stream(filetype, event, jobs, date), content_type=content_type)
+        response['Content-Disposition'] = 'attachment; filename="%s.%s"' % (filename, extension)
+        return response
 
-    # close buffer, send file
-    data = buffer.getvalue()
-    buffer.close()
-    response.write(data)
+    # exports are cached until the data is changed
+    language = translation.get_language()
+    extension, content_type = FILETYPES[filetype]
+    cache_key = get_export_cache_key(event, job, date, filetype, language)
 
-    return response
+    cached_path = get_cached_export(cache_key)
+    if cached_path:
+        return _export_response(request, cached_path, cache_key, "%s.%s" % (filename, extension), content_type)
+
+    # exports of all jobs or many helpers are generated in the background
+    if not job or HelperShift.objects.filter(shift__job=job).count() > settings.EXPORT_SYNC_MAX_HELPERS:
+        if filetype == 'excel':
+            name = _("{} (Excel)").format(filename)
+        else:
+            name = _("{} (PDF)").format(filename)
+
+        # the file is stored as artifact
+        artifact = ExportArtifact.objects.create(event=event, owner=request.user, name=name, filetype=filetype,
+                                                 expires=timezone.now() + ExportArtifact.PENDING_TIMEOUT)
+        transaction.on_commit(lambda: tasks.export_helpers.delay(str(artifact.pk), job_pk, date_str, language,
+                                                                 cache_key))
+
+        return HttpResponseRedirect(reverse('helpers', args=[event.url_name]))
+
+    # generate export, the file in the cache keeps the memory usage low for large exports
+    path = store_export(cache_key, lambda f: write_export(f, filetype, event, jobs, date))
+
+    return _export_response(request, path, cache_key, "%s.%s" % (filename, extension), content_type)
+
+
+def export_tasklist(request, event_url_name):
+    event = get_object_or_404(Event, url_name=event_url_name)
+
+    # do not return data if user is not authenticated
+    if not request.user.is_authenticated:
+        context = {'event': event,
+                   'tasks': None,
+                   'no_login': True}
+        return render(request, 'registration/admin/export_tasklist.html', context)
+
+    # recently started exports of this user (downloaded or expired files are not shown), the permissions were
+    # checked when the export was started
+    artifacts = ExportArtifact.objects.filter(event=event, owner=request.user, downloaded=False,
+                                              expires__gt=timezone.now())
+
+    context = {'event': event,
+               'tasks': artifacts,
+               'no_login': False}
+    return render(request, 'registration/admin/export_tasklist.html', context)
+
+
+@login_required
+@archived_not_available
+def export_download(request, event_url_name, artifact_pk):
+    event = get_object_or_404(Event, url_name=event_url_name)
+
+    # only the user who started the export can download it (the permissions were checked at this time)
+    artifact = get_object_or_404(ExportArtifact, pk=artifact_pk, event=event, owner=request.user)
+
+    if artifact.finished and not artifact.expired and os.path.isfile(artifact.path):
+        # remove from list
+        if not artifact.downloaded:
+            artifact.downloaded = True
+            artifact.save(update_fields=['downloaded'])
+
+        # send file
+        extension, content_type = FILETYPES[artifact.filetype]
+        return FileResponse(open(artifact.path, 'rb'), as_attachment=True,
+                            filename="%s.%s" % (artifact.filename, extension), content_type=content_type)
+    else:
+        # return error message
+        context = {'event': event}
+        return render(request, 'registration/admin/export_download.html', context)
@@ -1,16 +1,19 @@
 from django.contrib import messages
 from django.contrib.auth.decorators import login_required
 from django.urls import reverse
+from django.db.models import Exists, OuterRef, Prefetch
 from django.db.models.functions import TruncDate
 from django.http import Http404, HttpResponseRedirect
 from django.shortcuts import render, redirect, get_object_or_404
+from django.utils.dateparse import parse_date
 from django.utils.translation import ugettext as _
 
 from .utils import nopermission, get_or_404
 
-from ..models import Event, Shift
+from ..exceptions import ShiftFull
+from ..models import Event, HelperShift, Shift
 from ..forms import HelperForm, HelperDeleteForm, HelperDeleteCoordinatorForm, RegisterForm, HelperAddShiftForm, \
-    HelperAddCoordinatorForm, HelperSearchForm, HelperResendMailForm, HelperInternalCommentForm
+    HelperAddCoordinatorForm, HelperSearchForm, HelperResendMailForm, HelperInternalCommentForm, HelperFilterForm
 from ..decorators import archived_not_available
 from ..permissions import has_access, has_access_event_or_job, ACCESS_INVOLVED, ACCESS_JOB_EDIT_HELPERS, \
     ACCESS_JOB_VIEW_HELPERS, ACCESS_HELPER_EDIT, ACCESS_HELPER_VIEW, ACCESS_HELPER_RESEND, \
@@ -39,13 +42,21 @@ def helpers(request, event_url_name):
         .annotate(day=TruncDate('begin')).values_list('day', flat=True) \
         .order_by('day').distinct()
 
-    # overview over jobs
+    # overview over jobs, the shifts and coordinators are prefetched for the methods of `Job` and `Shift`
+    jobs = event.job_set.prefetch_related('shift_set', 'coordinators')
+
     context = {'event': event,
                'days': days,
+               'jobs': jobs,
                'user_can_export': user_can_export}
     return render(request, 'registration/admin/helpers.html', context)
 
 
+def _missed_shift(helper_ref):
+    """ Annotation for helpers that were absent for some of their shifts (see `Helper.has_missed_shift`). """
+    return Exists(HelperShift.objects.filter(helper=OuterRef(helper_ref), present=False, manual_presence=True))
+
+
 @login_required
 def helpers_for_job(request, event_url_name, job_pk):
     event, job, shift, helper = get_or_404(event_url_name, job_pk=job_pk)
@@ -56,17 +67,68 @@ def helpers_for_job(request, event_url_name, job_pk):
 
     user_manages_presence = has_access(request.user, event, ACCESS_GIFTS_HANDLE_PRESENCE)
 
-    shifts_by_day = job.shifts_by_day().items()
+    # the shifts and helpers are loaded per day by helpers_for_job_day
+    days = job.shift_set.annotate(day=TruncDate('begin')).values_list('day', flat=True).order_by('day').distinct()
+
+    coordinators = job.coordinators.select_related('event').annotate(missed_shift=_missed_shift('pk')) \
+        .order_by('timestamp')
+
+    filter_form = HelperFilterForm(request.GET or None)
 
     # show list of helpers
     context = {'event': event,
                'job': job,
-               'shifts_by_day': shifts_by_day,
+               'days': days,
+               'coordinators': coordinators,
+               'filter_form': filter_form,
+               'filter_query': request.GET.urlencode(),
                'user_manages_presence': user_manages_presence}
     return render(request, 'registration/admin/helpers_for_job.html',
                   context)
 
 
+@login_required
+def helpers_for_job_day(request, event_url_name, job_pk, date_str):
+    """ Shifts and helpers of a job on one day, loaded by the page of `helpers_for_job`.
+
+    The helpers can be filtered by name and presence with the GET parameters of `HelperFilterForm`.
+    """
+    event, job, shift, helper = get_or_404(event_url_name, job_pk=job_pk)
+
+    # check permission
+    if not has_access(request.user, job, ACCESS_JOB_VIEW_HELPERS):
+        return nopermission(request)
+
+    try:
+        day = parse_date(date_str)
+    except ValueError:
+        raise Http404
+
+    user_manages_presence = has_access(request.user, event, ACCESS_GIFTS_HANDLE_PRESENCE)
+
+    # helpers are filtered in the database and loaded with one query for all shifts
+    filter_form = HelperFilterForm(request.GET or None)
+    helpershifts = filter_form.filter(HelperShift.objects.select_related('helper', 'helper__event')
+                                      .annotate(missed_shift=_missed_shift('helper'))
+                                      .order_by('helper__timestamp'))
+
+    shifts = job.shift_set.filter(begin__date=day).order_by('begin', 'end') \
+        .prefetch_related(Prefetch('helpershift_set', queryset=helpershifts, to_attr='filtered_helpershifts'))
+
+    for shift in shifts:
+        shift.filtered_helpers = []
+        for helpershift in shift.filtered_helpershifts:
+            helpershift.helper.missed_shift = helpershift.missed_shift
+            shift.filtered_helpers.append(helpershift.helper)
+
+    context = {'event': event,
+               'job': job,
+               'shifts': shifts,
+               'filter_active': filter_form.is_active(),
+               'user_manages_presence': user_manages_presence}
+    return render(request, 'registration/admin/helpers_for_job_day.html', context)
+
+
 @login_required
 def view_helper(request, event_url_name, helper_pk):
     event, job, shift, helper = get_or_404(event_url_name, helper_pk=helper_pk)
@@ -170,8 +232,7 @@ def edit_helper(request, event_url_name, helper_pk):
 
         if form.email_has_changed:
             # we do not know here if it was an internal registration or not, so send the public version
-            if not helper.send_mail(request, internal=False):
-                messages.error(request, _("Sending the mail failed, but the helper was saved."))
+            helper.send_mail(request, internal=False)
 
         return HttpResponseRedirect(reverse('view_helper', args=[event_url_name, helper.pk]))
 
@@ -198,20 +259,23 @@ def add_helper(request, event_url_name, shift_pk):
                         selected_shifts=[shift, ], internal=True)
 
     if form.is_valid():
-        helper = form.save()
-
-        shiftids = [s.pk for s in all_shifts]
-        logger.info("helper created", extra={
-            'user': request.user,
-            'event': event,
-            'helper': helper,
-            'shifts': shiftids,
-        })
+        try:
+            helper = form.save()
+        except ShiftFull as e:
+            form.add_error(None, _("The shift \"%(shift)s\" just filled up. Please select another one.") %
+                           {'shift': e.shift})
+        else:
+            shiftids = [s.pk for s in all_shifts]
+            logger.info("helper created", extra={
+                'user': request.user,
+                'event': event,
+                'helper': helper,
+                'shifts': shiftids,
+            })
 
-        if not helper.send_mail(request, internal=True):
-            messages.error(request, _("Sending the mail failed, but the helper was saved."))
+            helper.send_mail(request, internal=True)
 
-        return HttpResponseRedirect(reverse('helpers_for_job', args=[event_url_name, shift.job.pk]))
+            return HttpResponseRedirect(reverse('helpers_for_job', args=[event_url_name, shift.job.pk]))
 
     # render page
     context = {'event': event,
@@ -241,8 +305,7 @@ def add_coordinator(request, event_url_name, job_pk):
             'helper': helper,
         })
 
-        if not helper.send_mail(request, internal=True):
-            messages.error(request, _("Sending the mail failed, but the coordinator was saved."))
+        helper.send_mail(request, internal=True)
 
         return HttpResponseRedirect(reverse('helpers_for_job', args=[event_url_name, job.pk]))
 
@@ -265,17 +328,21 @@ def add_helper_to_shift(request, event_url_name, helper_pk):
                               user=request.user)
 
     if form.is_valid():
-        form.save()
-
-        # TODO: add shifts
-        logger.info("helper newshift", extra={
-            'user': request.user,
-            'event': event,
-            'helper': helper,
-        })
+        try:
+            form.save()
+        except ShiftFull as e:
+            form.add_error(None, _("The shift \"%(shift)s\" just filled up. Please select another one.") %
+                           {'shift': e.shift})
+        else:
+            # TODO: add shifts
+            logger.info("helper newshift", extra={
+                'user': request.user,
+                'event': event,
+                'helper': helper,
+            })
 
-        return HttpResponseRedirect(reverse('view_helper',
-                                            args=[event_url_name, helper.pk]))
+            return HttpResponseRedirect(reverse('view_helper',
+                                                args=[event_url_name, helper.pk]))
 
     # render page
     context = {'event': event,
@@ -452,14 +519,12 @@ def resend_mail(request, event_url_name, helper_pk):
             'helper': helper,
         })
 
-        if helper.send_mail(request, internal=False):
-            messages.success(request, _("Confirmation mail was sent"))
+        # clear error message about undelivered mail, it is set again if the mail cannot be delivered
+        helper.mail_failed = None
+        helper.save()
 
-            # clear error message about undelivered mail
-            helper.mail_failed = None
-            helper.save()
-        else:
-            messages.error(request, _("Sending the mail failed."))
+        helper.send_mail(request, internal=False)
+        messages.success(request, _("Confirmation mail was queued and will be sent shortly"))
 
         return HttpResponseRedirect(reverse('view_helper', args=[event_url_name, helper.pk]))
 
@@ -1,18 +1,21 @@
 import datetime
+import hashlib
+import json
 
 from django.conf import settings
-from django.contrib import messages
 from django.core.exceptions import ValidationError
 from django.urls import reverse
-from django.http import HttpResponseRedirect, Http404
+from django.http import HttpResponse, HttpResponseRedirect, Http404, JsonResponse
 from django.shortcuts import render, get_object_or_404, redirect
+from django.utils.cache import get_conditional_response, patch_cache_control
 from django.utils.translation import ugettext as _
 
 from .utils import nopermission, get_or_404
 
+from ..exceptions import ShiftFull
 from ..forms import RegisterForm, DeregisterForm, HelperForm
-from ..models import Event, Link
-from ..permissions import has_access, ACCESS_INVOLVED
+from ..models import Event, Link, Shift
+from ..permissions import has_access, involved_event_pks, ACCESS_INVOLVED
 
 
 from news.helper import news_test_email
@@ -38,8 +41,9 @@ def index(request, filter_old_events=True):
     if not request.user.is_anonymous:
         # first get all involved events
         all_involved_events = []
+        involved_pks = involved_event_pks(request.user)
         for event in events:
-            event.involved = has_access(request.user, event, ACCESS_INVOLVED)
+            event.involved = event.pk in involved_pks
 
             if event.involved and not event.active:
                 all_involved_events.append(event)
@@ -104,25 +108,106 @@ def form(request, event_url_name, link_pk=None):
                         link=link is not None)
 
     if form.is_valid():
-        helper = form.save()
+        try:
+            helper = form.save()
+        except ShiftFull as e:
+            form.add_error(None, _("The shift \"%(shift)s\" just filled up. Please select another one.") %
+                           {'shift': e.shift})
+        else:
+            logger.info("helper registered", extra={
+                'event': event,
+                'helper': helper,
+                'withlink': link_pk is not None,
+            })
 
-        logger.info("helper registered", extra={
-            'event': event,
-            'helper': helper,
-            'withlink': link_pk is not None,
-        })
+            helper.send_mail(request, internal=False)
+
+            return HttpResponseRedirect(reverse('registered', args=[event.url_name, helper.pk]))
 
-        if not helper.send_mail(request, internal=False):
-            messages.error(request, _("Sending the mail failed, but the registration was saved."))
+    # url for the automatic update of full shifts
+    if link:
+        availability_url = reverse('availability_for_link', args=[event.url_name, link.pk])
+    else:
+        availability_url = reverse('availability', args=[event.url_name])
 
-        return HttpResponseRedirect(reverse('registered', args=[event.url_name, helper.pk]))
+    # the cached shifts do not contain the number of helpers, registration.js applies it
+    availability = None
+    if form.shifts_cache_key:
+        availability = _get_availability(event, all_shifts if link else None, link is not None)
 
     context = {'event': event,
                'form': form,
-               'user_is_involved': user_is_involved}
+               'user_is_involved': user_is_involved,
+               'availability_url': availability_url,
+               'availability': availability}
     return render(request, 'registration/form.html', context)
 
 
+def _get_availability(event, shifts, link):
+    """ Returns the number of helpers of the shifts as list of dicts (see `availability`).
+
+    If `shifts` is None, all shifts of the public registration form are used.
+    """
+    if shifts is None:
+        shifts = Shift.objects.filter(job__event=event, job__public=True, hidden=False)
+
+    data = []
+    shift_values = shifts.order_by('pk').values_list('pk', 'occupancy', 'number', 'blocked')
+    for pk, occupancy, number, blocked in shift_values:
+        # blocked shifts are displayed as full, but they can be used with links
+        blocked = blocked and not link
+
+        data.append({
+            'id': pk,
+            'occupancy': occupancy if event.show_public_numbers else None,
+            'capacity': number if event.show_public_numbers else None,
+            'blocked': blocked,
+            'full': blocked or occupancy >= number,
+        })
+
+    return data
+
+
+def availability(request, event_url_name, link_pk=None):
+    """ Returns the number of helpers of all shifts of the registration form (or a link) as JSON.
+
+    The ETag is derived from the returned data, so clients and proxies get a 304 response as long as the
+    number of helpers does not change.
+    """
+    event = get_object_or_404(Event, url_name=event_url_name)
+
+    # same permission checks as for the registration form
+    if link_pk:
+        try:
+            link = Link.objects.get(pk=link_pk)
+        except (Link.DoesNotExist, ValidationError):
+            raise Http404()
+
+        if link.event != event:
+            raise Http404()
+
+        shifts = link.shifts.all()
+    else:
+        if not event.active and not has_access(request.user, event, ACCESS_INVOLVED):
+            return JsonResponse({}, status=403)
+
+        shifts = None
+
+    data = _get_availability(event, shifts, link_pk is not None)
+
+    content = json.dumps({'shifts': data})
+    etag = '"{}"'.format(hashlib.sha1(content.encode()).hexdigest())
+
+    # 304 if the ETag matches, otherwise the data
+    response = get_conditional_response(request, etag=etag)
+    if response is None:
+        response = HttpResponse(content, content_type='application/json')
+
+    response['ETag'] = etag
+    patch_cache_control(response, no_cache=True)
+    return response
+
+
 def registered(request, event_url_name, helper_id=None):
     event, job, shift, helper = get_or_404(event_url_name, helper_pk=helper_id,
                                            handle_duplicates=True)
@@ -221,8 +306,7 @@ def update_personal(request, event_url_name, helper_id):
         })
 
         if form.email_has_changed:
-            if not helper.send_mail(request, internal=False):
-                messages.error(request, _("Sending the mail failed, but the change was saved."))
+            helper.send_mail(request, internal=False)
 
         return HttpResponseRedirect(reverse('registered',
                                             args=[event.url_name, helper.pk]))
@@ -1,5 +1,9 @@
 from django.contrib.auth.decorators import login_required
+from django.db.models import F
+from django.http import Http404, JsonResponse
 from django.shortcuts import render, get_object_or_404
+from django.utils.dateparse import parse_date
+from django.utils.timezone import localtime
 from collections import OrderedDict
 from django.db.models.functions import TruncDate
 
@@ -10,6 +14,60 @@ from ..decorators import archived_not_available
 from ..permissions import has_access, ACCESS_INVOLVED
 
 
+def _get_filters(request, jobs):
+    """ Returns the day and job that were selected with the GET parameters `day` and `job` (or None). """
+    day = None
+    day_str = request.GET.get('day')
+    if day_str:
+        try:
+            day = parse_date(day_str)
+        except ValueError:
+            raise Http404
+
+        if not day:
+            raise Http404
+
+    job = None
+    job_str = request.GET.get('job')
+    if job_str:
+        job = next((j for j in jobs if str(j.pk) == job_str), None)
+        if not job:
+            raise Http404
+
+    return day, job
+
+
+def _get_vacant_shifts(event, jobs, day=None, job=None):
+    """ Returns the vacant shifts of the event grouped by day and job.
+
+    The result is an `OrderedDict` with the days as keys, the values are `OrderedDict`s with the jobs as keys
+    (in the order of `jobs`) and the sorted lists of vacant shifts as values. For every shift, `num_vacant`
+    is set. All shifts are loaded with one query.
+    """
+    shifts = Shift.objects.filter(job__event=event, occupancy__lt=F('number')).order_by('begin', 'end')
+    if day:
+        shifts = shifts.filter(begin__date=day)
+    if job:
+        shifts = shifts.filter(job=job)
+
+    # group by day and job
+    jobs_by_pk = {j.pk: j for j in jobs}
+    shifts_by_day = OrderedDict()
+    for shift in shifts:
+        shift.job = jobs_by_pk[shift.job_id]
+        shift.num_vacant = shift.number - shift.num_helpers()
+
+        # shifts are sorted by begin, so the days are sorted too
+        shifts_by_day.setdefault(localtime(shift.begin).date(), {}).setdefault(shift.job_id, []).append(shift)
+
+    # sort jobs
+    vacant_days = OrderedDict()
+    for vacant_day, shifts_by_job in shifts_by_day.items():
+        vacant_days[vacant_day] = OrderedDict((j, shifts_by_job[j.pk]) for j in jobs if j.pk in shifts_by_job)
+
+    return vacant_days
+
+
 @login_required
 @archived_not_available
 def vacant_shifts(request, event_url_name):
@@ -19,32 +77,52 @@ def vacant_shifts(request, event_url_name):
     if not has_access(request.user, event, ACCESS_INVOLVED):
         return nopermission(request)
 
-    # first, get all days
+    # all days and jobs (for the filter)
     days = Shift.objects.filter(job__event=event) \
         .annotate(day=TruncDate('begin')).values_list('day', flat=True) \
         .order_by('day').distinct()
+    jobs = list(event.job_set.all())
 
-    # then check every day for vacant shifts
-    jobs = event.job_set.all()
-    vacant_days = OrderedDict()
-    for day in days:
-        vacant_jobs_on_day = OrderedDict()
-        for job in jobs:
-            vacant_shifts_on_day = []
-            shifts = job.shift_set.filter(begin__date=day)
-
-            for shift in shifts:
-                if not shift.is_full():
-                    shift.num_vacant = shift.number - shift.num_helpers()
-                    vacant_shifts_on_day.append(shift)
-
-            if vacant_shifts_on_day:
-                vacant_jobs_on_day[job] = vacant_shifts_on_day
-
-        if vacant_jobs_on_day:
-            vacant_days[day] = vacant_jobs_on_day
+    day, job = _get_filters(request, jobs)
 
     context = {'event': event,
                'no_shifts': len(days) == 0,
-               'vacant_days': vacant_days}
+               'days': days,
+               'jobs': jobs,
+               'selected_day': day,
+               'selected_job': job,
+               'vacant_days': _get_vacant_shifts(event, jobs, day, job)}
     return render(request, 'registration/admin/vacant_shifts.html', context)
+
+
+@login_required
+@archived_not_available
+def vacant_shifts_json(request, event_url_name):
+    event = get_object_or_404(Event, url_name=event_url_name)
+
+    # check permission
+    if not has_access(request.user, event, ACCESS_INVOLVED):
+        return JsonResponse({}, status=403)
+
+    jobs = list(event.job_set.all())
+    day, job = _get_filters(request, jobs)
+
+    data = []
+    for vacant_day, vacant_jobs in _get_vacant_shifts(event, jobs, day, job).items():
+        data.append({
+            'day': vacant_day,
+            'jobs': [{
+                'id': vacant_job.pk,
+                'name': vacant_job.name,
+                'shifts': [{
+                    'id': shift.pk,
+                    'name': shift.name,
+                    'begin': shift.begin,
+                    'end': shift.end,
+                    'number': shift.number,
+                    'vacant': shift.num_vacant,
+                } for shift in shifts],
+            } for vacant_job, shifts in vacant_jobs.items()],
+        })
+
+    return JsonResponse({'days': data})